@@ -252,6 +252,49 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL
 EMAIL_TIMEOUT = 10  # Reduced from 30 to prevent worker timeout
 EMAIL_SSL_CERTFILE = None
 EMAIL_SSL_KEYFILE = None
+# Pooled sending (healthbridge_app/services/mail_dispatcher.py): keep the
+# concurrency at or below the provider's simultaneous connection limit
+EMAIL_MAX_CONCURRENCY = int(os.getenv('EMAIL_MAX_CONCURRENCY', 4))
+EMAIL_CHUNK_SIZE = 100
+EMAIL_MAX_ATTEMPTS = 3
+EMAIL_RETRY_BASE_SECONDS = 2  # 2s, 4s, ... between attempts for the failed messages only
+EMAIL_RETRY_MAX_SECONDS = 60
+
+# Expiry alerts are sent once per milestone (days before expiry) instead of daily
+EXPIRY_ALERT_MILESTONES = [
+    int(days) for days in os.getenv('EXPIRY_ALERT_MILESTONES', '10,7,3,1,0').split(',') if days.strip()
+]
+# Expiry alert channels: "email", "dashboard" (in-app notifications for donors) or "both"
+EXPIRY_ALERT_CHANNELS = os.getenv('EXPIRY_ALERT_CHANNELS', 'email')
+# Urgency levels that also get an email when dashboard alerts are on, e.g. "critical,high" (empty = all)
+EXPIRY_EMAIL_LEVELS = os.getenv('EXPIRY_EMAIL_LEVELS', '')
+# Longest the expiry scheduler sleeps before resyncing its timeline (seconds)
+EXPIRY_SCHEDULER_MAX_SLEEP = 3600
+# Where run lock files live when the database has no advisory locks (SQLite)
+RUN_LOCK_DIR = os.getenv('RUN_LOCK_DIR', '')
+# How long the admin dashboard reuses a computed waste forecast (seconds)
+WASTE_FORECAST_CACHE_SECONDS = 3600
+# Each process rebuilds its medicine autocomplete and spelling indexes from the database
+# this often, picking up names saved by other processes (seconds)
+AUTOCOMPLETE_INDEX_MAX_AGE = 600
+# Most distinct words the spelling-correction index keeps in memory per process
+FUZZY_INDEX_MAX_WORDS = 50000
+# Shared medicine name catalog, compiled by `python manage.py build_medicine_catalog` at build
+# time and memory-mapped by every web worker on the host. It is local to each web host (no
+# disk shared with the worker is needed): names saved since are served from each process's
+# index, and one web worker per host recompiles the file once it is REBUILD_DELAY old.
+# Empty = each process keeps its own autocomplete index instead.
+MEDICINE_CATALOG_PATH = os.getenv('MEDICINE_CATALOG_PATH', str(BASE_DIR / 'var' / 'medicine_catalog.bin'))
+MEDICINE_CATALOG_CHECK_SECONDS = 5  # How often workers look for a replaced catalog file
+MEDICINE_CATALOG_REBUILD_DELAY = 300  # Least age (seconds) of a catalog rebuilt because names were added
+
+# Background job queue (processed by `python manage.py run_worker`)
+# Set JOB_QUEUE_EAGER=True to run jobs inline after commit when no worker is running
+JOB_QUEUE_EAGER = os.getenv('JOB_QUEUE_EAGER', 'False') == 'True'
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 30  # 30s, 60s, 120s, ... between attempts
+JOB_RETRY_MAX_SECONDS = 3600
+JOB_STALE_SECONDS = 900  # Requeue jobs whose worker died mid-run
 
 # Logging configuration
 LOGGING = {
@@ -1,4 +1,4 @@
-from datetime import date, timedelta
+from datetime import timedelta
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.utils import timezone
@@ -25,8 +25,8 @@ def dashboard(request):
     recent_donations = Donation.objects.filter(donor=request.user).order_by('-donated_at')[:5]
     
     # Expiring donations warning
-    user_expiring = Donation.objects.expiring_within(days=10).filter(donor=request.user)
-    critical_donations = user_expiring.filter(expiry_date__lte=date.today() + timedelta(days=3))
+    user_expiring = list(Donation.objects.expiring_within(days=10).filter(donor=request.user).with_urgency())
+    critical_donations = [donation for donation in user_expiring if donation.days_left <= 3]
     
     context.update({
         'total_donations': total_donations,
@@ -54,22 +54,15 @@ def dashboard(request):
     
     # Admin features (if staff)
     if request.user.is_staff:
-        all_expiring = Donation.objects.expiring_within(days=14)
+        # Every urgency bucket from one query
+        all_expiring = Donation.objects.expiring_within(days=14).grouped_by_urgency()
         
-        context['critical_donations'] = all_expiring.filter(expiry_date__lte=date.today() + timedelta(days=1))
-        context['high_priority_donations'] = all_expiring.filter(
-            expiry_date__gt=date.today() + timedelta(days=1),
-            expiry_date__lte=date.today() + timedelta(days=3)
-        )
-        context['medium_priority_donations'] = all_expiring.filter(
-            expiry_date__gt=date.today() + timedelta(days=3),
-            expiry_date__lte=date.today() + timedelta(days=7)
-        )
-        context['low_priority_donations'] = all_expiring.filter(
-            expiry_date__gt=date.today() + timedelta(days=7)
-        )
+        context['critical_donations'] = all_expiring['critical']
+        context['high_priority_donations'] = all_expiring['high']
+        context['medium_priority_donations'] = all_expiring['medium']
+        context['low_priority_donations'] = all_expiring['low']
         
-        context['total_expiring_count'] = all_expiring.count()
+        context['total_expiring_count'] = sum(len(bucket) for bucket in all_expiring.values())
         context['recent_alerts'] = ExpiryAlert.objects.filter(
             alert_sent_at__gte=timezone.now() - timedelta(days=7)
         ).select_related('donation')[:10]
@@ -117,8 +110,8 @@ def donor_dashboard(request):
     recent_donations = Donation.objects.filter(donor=request.user).order_by('-donated_at')[:10]
     
     # Expiring donations warning
-    user_expiring = Donation.objects.expiring_within(days=10).filter(donor=request.user)
-    critical_donations = user_expiring.filter(expiry_date__lte=date.today() + timedelta(days=3))
+    user_expiring = list(Donation.objects.expiring_within(days=10).filter(donor=request.user).with_urgency())
+    critical_donations = [donation for donation in user_expiring if donation.days_left <= 3]
     
     # Pending requests (matched but not yet claimed) - only show APPROVED requests
     pending_requests = MedicineRequest.objects.filter(
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Donation, ExpiryAlert
+from .models import Donation, ExpiryAlert, ExpiryCalendar, ExpiryRun
 
 
 @admin.register(Donation)
@@ -32,3 +32,16 @@ class ExpiryAlertAdmin(admin.ModelAdmin):
     list_filter = ['alert_type', 'alert_sent_at']
     search_fields = ['donation__name', 'recipient_email']
     readonly_fields = ['alert_sent_at']
+
+
+@admin.register(ExpiryRun)
+class ExpiryRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'status', 'incremental', 'days_ahead', 'donations_scanned', 'alerts_planned', 'emails_sent', 'notifications_created']
+    list_filter = ['status', 'incremental', 'started_at']
+    readonly_fields = ['started_at', 'finished_at', 'run_date', 'watermark', 'parameters', 'donations_scanned', 'alerts_planned', 'emails_sent', 'notifications_created', 'error']
+
+
+@admin.register(ExpiryCalendar)
+class ExpiryCalendarAdmin(admin.ModelAdmin):
+    list_display = ['day', 'donations', 'units']
+    readonly_fields = ['day', 'donations', 'units']
@@ -0,0 +1,55 @@
+"""
+Database expressions for expiry urgency
+Computes days until expiry and urgency buckets in SQL instead of per row in Python
+"""
+from datetime import date
+from typing import List, Optional, Tuple
+
+from django.db.models import Case, CharField, DateField, Func, IntegerField, Value, When
+
+
+# (level, last day count in that level), checked in order; anything later is "normal"
+URGENCY_LEVELS: List[Tuple[str, int]] = [
+    ('expired', -1),
+    ('critical', 0),   # expires today
+    ('high', 3),       # expires in 1-3 days
+    ('medium', 7),     # expires in 4-7 days
+    ('low', 14),       # expires in 8-14 days
+]
+
+# Coarser buckets used by the expiry dashboards and monitoring service; anything later is "low"
+ALERT_PRIORITIES: List[Tuple[str, int]] = [
+    ('critical', 1),
+    ('high', 3),
+    ('medium', 7),
+]
+
+
+class DaysUntil(Func):
+    """Whole days from `today` until a date column (negative once it has passed)"""
+    output_field = IntegerField()
+
+    def __init__(self, expression, today: Optional[date] = None, **extra):
+        super().__init__(expression, Value(today or date.today(), output_field=DateField()), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date is an integer number of days
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        target, target_params = compiler.compile(self.source_expressions[0])
+        today, today_params = compiler.compile(self.source_expressions[1])
+        return f"CAST(julianday({target}) - julianday({today}) AS INTEGER)", (*target_params, *today_params)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='DATEDIFF', **extra_context)
+
+
+def urgency_case(days_field: str = 'days_left', levels: List[Tuple[str, int]] = URGENCY_LEVELS,
+                 default: str = 'normal') -> Case:
+    """CASE expression mapping an annotated day count to the first level whose limit it is within"""
+    return Case(
+        *[When(**{f'{days_field}__lte': limit}, then=Value(level)) for level, limit in levels],
+        default=Value(default),
+        output_field=CharField(),
+    )
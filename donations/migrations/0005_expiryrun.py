@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:01
+
+import datetime
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0004_set_all_to_pending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('run_date', models.DateField(default=datetime.date.today, help_text='Day the run evaluated expiry against')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('days_ahead', models.PositiveIntegerField(default=10)),
+                ('incremental', models.BooleanField(default=False)),
+                ('watermark', models.DateTimeField(blank=True, help_text='Start of the previous successful run this incremental run continued from', null=True)),
+                ('parameters', models.JSONField(blank=True, default=dict)),
+                ('donations_scanned', models.PositiveIntegerField(default=0)),
+                ('alerts_planned', models.PositiveIntegerField(default=0)),
+                ('emails_sent', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['status', '-started_at'], name='donations_e_status_dd37ba_idx')],
+            },
+        ),
+    ]
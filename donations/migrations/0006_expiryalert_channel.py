@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0005_expiryrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expiryrun',
+            name='notifications_created',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expiryalert',
+            unique_together={('donation', 'days_before_expiry', 'recipient_email', 'alert_type')},
+        ),
+    ]
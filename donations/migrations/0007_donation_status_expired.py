@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0006_expiryalert_channel'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='donation',
+            name='status',
+            field=models.CharField(choices=[('available', 'Available'), ('reserved', 'Reserved'), ('picked_up', 'Picked up'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='available', max_length=20),
+        ),
+    ]
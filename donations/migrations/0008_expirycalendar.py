@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:18
+
+from datetime import date
+
+from django.db import migrations, models
+
+
+def fill_calendar(apps, schema_editor):
+    """Seed the calendar from the live donations already in the table"""
+    Donation = apps.get_model('donations', 'Donation')
+    ExpiryCalendar = apps.get_model('donations', 'ExpiryCalendar')
+    rows = (
+        Donation.objects.filter(expiry_date__gte=date.today(), status__in=['available', 'reserved'])
+        .values('expiry_date')
+        .annotate(donations=models.Count('id'), units=models.Sum('quantity'))
+        .order_by('expiry_date')
+    )
+    ExpiryCalendar.objects.bulk_create([
+        ExpiryCalendar(day=row['expiry_date'], donations=row['donations'], units=row['units'] or 0)
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0007_donation_status_expired'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('donations', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Expiry calendar',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.RunPython(fill_calendar, migrations.RunPython.noop),
+    ]
@@ -5,9 +5,11 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from .expressions import ALERT_PRIORITIES, URGENCY_LEVELS, DaysUntil, urgency_case
 
-class DonationManager(models.Manager):
-    """Custom manager for Donation model with expiry-related methods"""
+
+class DonationQuerySet(models.QuerySet):
+    """Expiry-related filters, usable on any donation queryset"""
     
     def expiring_within(self, days=10):
         """Get donations expiring within specified days"""
@@ -32,6 +34,41 @@ class DonationManager(models.Manager):
             expiry_date__gte=date.today(),
             status__in=[Donation.Status.AVAILABLE, Donation.Status.RESERVED]
         ).order_by('expiry_date')
+    
+    def with_urgency(self):
+        """Annotate `days_left` and `urgency` in SQL so rows don't compute them one by one"""
+        return self.annotate(days_left=DaysUntil('expiry_date')).annotate(urgency=urgency_case())
+    
+    def grouped_by_urgency(self, levels=ALERT_PRIORITIES, default='low'):
+        """
+        Every row bucketed by urgency from a single query, most urgent first:
+        {'critical': [...], 'high': [...], 'medium': [...], 'low': [...]}
+        Bucket sizes are the list lengths.
+        """
+        groups = {level: [] for level, _ in levels}
+        groups.setdefault(default, [])
+        rows = (
+            self.with_urgency()
+            .annotate(urgency_bucket=urgency_case(levels=levels, default=default))
+            .order_by('expiry_date', 'id')
+        )
+        for donation in rows:
+            groups[donation.urgency_bucket].append(donation)
+        return groups
+
+
+class DonationManager(models.Manager.from_queryset(DonationQuerySet)):
+    """Custom manager for Donation model with expiry-related methods"""
+
+
+def urgency_level_for(days):
+    """Urgency level for a number of days until expiry (same ladder as the SQL annotation)"""
+    if days is None:
+        return "normal"
+    for level, limit in URGENCY_LEVELS:
+        if days <= limit:
+            return level
+    return "normal"    # expires in 15+ days
 
 
 class Donation(models.Model):
@@ -41,6 +78,7 @@ class Donation(models.Model):
         PICKED_UP = "picked_up", "Picked up"
         DELIVERED = "delivered", "Delivered"
         CANCELLED = "cancelled", "Cancelled"
+        EXPIRED = "expired", "Expired"  # set by the expired-inventory sweep
     
     class ApprovalStatus(models.TextChoices):
         PENDING = "pending", "Pending Admin Approval"
@@ -88,17 +126,41 @@ class Donation(models.Model):
 
     objects = DonationManager()  # Custom manager
 
+    # Statuses still in circulation; only these count towards the expiry calendar
+    LIVE_STATUSES = (Status.AVAILABLE, Status.RESERVED)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributes to the expiry calendar so a save can apply the difference
+        if not instance.get_deferred_fields() & {'expiry_date', 'quantity', 'status'}:
+            instance._calendar_entry = instance.calendar_entry()
+        # ...and which name it has in the autocomplete index
+        if 'name' not in instance.get_deferred_fields():
+            instance._indexed_name = instance.name
+        return instance
+
     def save(self, *args, **kwargs):
         # create a short unique code like AB12CD34EF
         if not self.tracking_code:
             self.tracking_code = uuid4().hex[:12].upper()
         super().save(*args, **kwargs)
 
+    def calendar_entry(self):
+        """(expiry_date, units) this donation adds to the expiry calendar, or None if it is not live"""
+        if self.status not in self.LIVE_STATUSES or not self.expiry_date:
+            return None
+        expiry_date = self._meta.get_field('expiry_date').to_python(self.expiry_date)
+        return expiry_date, self.quantity or 0
+
     @property
     def days_until_expiry(self):
         """Calculate days until expiry (negative if already expired)"""
         if not self.expiry_date:
             return None
+        # Rows from with_urgency() already carry the value computed in SQL
+        if 'days_left' in self.__dict__:
+            return self.days_left
         delta = self.expiry_date - date.today()
         return delta.days
     
@@ -122,22 +184,10 @@ class Donation(models.Model):
         """Return urgency level based on days until expiry"""
         if not self.expiry_date:
             return "normal"
+        if 'urgency' in self.__dict__:
+            return self.urgency
         
-        days = self.days_until_expiry
-        if days is None:
-            return "normal"
-        elif days < 0:
-            return "expired"
-        elif days == 0:
-            return "critical"  # expires today
-        elif days <= 3:
-            return "high"      # expires in 1-3 days
-        elif days <= 7:
-            return "medium"    # expires in 4-7 days
-        elif days <= 14:
-            return "low"       # expires in 8-14 days
-        else:
-            return "normal"    # expires in 15+ days
+        return urgency_level_for(self.days_until_expiry)
 
     def __str__(self):
         base = f"{self.name} ({self.quantity})"
@@ -161,7 +211,8 @@ class ExpiryAlert(models.Model):
     )
     
     class Meta:
-        unique_together = ['donation', 'days_before_expiry', 'recipient_email']
+        # One alert per milestone, recipient and channel
+        unique_together = ['donation', 'days_before_expiry', 'recipient_email', 'alert_type']
         ordering = ['-alert_sent_at']
     
     @property
@@ -171,3 +222,193 @@ class ExpiryAlert(models.Model):
     
     def __str__(self):
         return f"Alert for {self.donation.name} ({self.days_before_expiry} days before expiry)"
+
+
+class ExpiryRunQuerySet(models.QuerySet):
+    def last_successful(self, days_ahead=0, shard=None, channels=None, email_levels=None):
+        """
+        Most recent successful run that covered at least `days_ahead` days.
+        Runs started with --shard only continue from runs of the same shard.
+        Given `channels` (and `email_levels`), only runs that delivered at
+        least those channels (and urgency levels by email) count: an
+        email-only run is no watermark for dashboard notifications.
+        """
+        runs = self.filter(
+            status=ExpiryRun.Status.SUCCEEDED,
+            days_ahead__gte=days_ahead,
+        )
+        if shard:
+            runs = runs.filter(parameters__shard=shard)
+        else:
+            runs = runs.exclude(parameters__has_key='shard')
+        runs = runs.order_by('-started_at')
+        if channels is None:
+            return runs.first()
+        for run in runs.iterator(chunk_size=50):
+            if run.covers(channels, email_levels):
+                return run
+        return None
+
+
+class ExpiryRun(models.Model):
+    """Ledger of check_expiry runs: timing, parameters and counts"""
+    
+    class Status(models.TextChoices):
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+    
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    run_date = models.DateField(default=date.today, help_text="Day the run evaluated expiry against")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.RUNNING)
+    
+    # Parameters
+    days_ahead = models.PositiveIntegerField(default=10)
+    incremental = models.BooleanField(default=False)
+    watermark = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Start of the previous successful run this incremental run continued from"
+    )
+    parameters = models.JSONField(default=dict, blank=True)
+    
+    # Counts
+    donations_scanned = models.PositiveIntegerField(default=0)
+    alerts_planned = models.PositiveIntegerField(default=0)
+    emails_sent = models.PositiveIntegerField(default=0)
+    notifications_created = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    
+    objects = ExpiryRunQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['status', '-started_at']),
+        ]
+    
+    @property
+    def duration(self):
+        """Wall-clock duration of the run, or None while it is still running"""
+        if not self.finished_at:
+            return None
+        return self.finished_at - self.started_at
+    
+    def finish(self, **counts):
+        """Mark the run as succeeded and store its counts"""
+        for field, value in counts.items():
+            setattr(self, field, value)
+        self.status = self.Status.SUCCEEDED
+        self.finished_at = timezone.now()
+        self.save()
+    
+    def covers(self, channels, email_levels=None):
+        """
+        Whether this run delivered every channel in `channels` and, if email
+        is one of them, every urgency level in `email_levels` (None = all).
+        Runs recorded before channels existed were email-only.
+        """
+        run_channels = self.parameters.get('channels') or ['email']
+        if not set(channels) <= set(run_channels):
+            return False
+        if 'email' not in channels:
+            return True
+        run_levels = self.parameters.get('email_levels')
+        if run_levels is None:
+            return True
+        return email_levels is not None and set(email_levels) <= set(run_levels)
+    
+    def fail(self, error):
+        """Mark the run as failed"""
+        self.status = self.Status.FAILED
+        self.error = str(error)
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at'])
+    
+    def __str__(self):
+        return f"Expiry run {self.started_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
+
+
+class ExpiryCalendarQuerySet(models.QuerySet):
+    def window(self, days=10, today=None):
+        """Calendar days from today up to and including today + days"""
+        today = today or date.today()
+        return self.filter(day__gte=today, day__lte=today + timedelta(days=days))
+
+    def expiring_within(self, days=10, today=None):
+        """Live donations and units expiring within `days` days: {'donations': n, 'units': n}"""
+        totals = self.window(days, today).aggregate(
+            donations=models.Sum('donations'),
+            units=models.Sum('units'),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+    def next_expiry_day(self, today=None):
+        """First day from today on which a live donation expires, or None"""
+        return (
+            self.filter(day__gte=today or date.today(), donations__gt=0)
+            .order_by('day')
+            .values_list('day', flat=True)
+            .first()
+        )
+
+    def apply(self, changes):
+        """
+        Add per-day deltas {day: (donations, units)}. Missing days are
+        created first, then each day is updated in place with F() so
+        concurrent writers never lose an increment.
+        """
+        changes = {day: delta for day, delta in changes.items() if day and any(delta)}
+        if not changes:
+            return
+        self.bulk_create([ExpiryCalendar(day=day) for day in changes], ignore_conflicts=True)
+        for day, (donations, units) in changes.items():
+            self.filter(day=day).update(
+                donations=models.F('donations') + donations,
+                units=models.F('units') + units,
+            )
+
+    def prune(self, today=None):
+        """Drop days that have already passed"""
+        return self.filter(day__lt=today or date.today()).delete()[0]
+
+    def rebuild(self, today=None):
+        """Recompute the whole calendar from the donations table; returns the number of days stored"""
+        from django.db import transaction
+
+        rows = (
+            Donation.objects.filter(expiry_date__gte=today or date.today(), status__in=Donation.LIVE_STATUSES)
+            .values('expiry_date')
+            .annotate(donations=models.Count('id'), units=models.Sum('quantity'))
+            .order_by('expiry_date')
+        )
+        with transaction.atomic():
+            self.all().delete()
+            days = self.bulk_create([
+                ExpiryCalendar(day=row['expiry_date'], donations=row['donations'], units=row['units'] or 0)
+                for row in rows
+            ])
+        return len(days)
+
+
+class ExpiryCalendar(models.Model):
+    """
+    Per-day count of live donations and units by expiry date, kept current by
+    the donation save/delete signals. "How many expire in the next N days"
+    reads at most N + 1 rows instead of scanning the donations table.
+    Queryset updates and bulk inserts bypass the signals; run
+    `manage.py rebuild_expiry_calendar` after those.
+    """
+    
+    day = models.DateField(unique=True)
+    donations = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    
+    objects = ExpiryCalendarQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['day']
+        verbose_name_plural = 'Expiry calendar'
+    
+    def __str__(self):
+        return f"{self.day}: {self.donations} donations, {self.units} units"
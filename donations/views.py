@@ -5,7 +5,9 @@ from django.core.cache import cache
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from healthbridge_app.models import GenericMedicine
+from healthbridge_app.autocomplete_index import autocomplete
+from healthbridge_app.fuzzy_index import fuzzy_filter
+from healthbridge_app.search_backend import get_search_backend
 from .models import Donation
 
 
@@ -114,13 +116,11 @@ def medicine_search(request):
     start_date = request.GET.get('start_date', '').strip()
     end_date = request.GET.get('end_date', '').strip()
     
-    medicines = Donation.objects.all()
+    # Swept (expired) donations are no longer part of the inventory
+    medicines = Donation.objects.exclude(status=Donation.Status.EXPIRED)
     filter_message = None
     filter_error = None
-
-    # Apply name search
-    if query:
-        medicines = medicines.filter(name__icontains=query)
+    corrected_query = None
 
     # Apply expiry date range filter
     if start_date or end_date:
@@ -148,9 +148,15 @@ def medicine_search(request):
         except ValueError:
             filter_error = "Invalid date format. Please use YYYY-MM-DD."
 
+    # Apply name search last, so "no exact match" means none within the filters above
+    if query:
+        # Retried with corrected spelling ("amoxicilin") when nothing matches as typed
+        medicines, corrected_query = fuzzy_filter(medicines, 'name', query)
+
     return render(request, 'donations/medicine_search.html', {
         'medicines': medicines,
         'query': query,
+        'corrected_query': corrected_query,
         'start_date': start_date,
         'end_date': end_date,
         'filter_message': filter_message,
@@ -166,25 +172,18 @@ def medicine_autocomplete(request):
     if not query or len(query) < 2:
         return JsonResponse({'suggestions': []})
     
-    # Try to get from cache first (cache for 5 minutes)
+    # Word-prefix matches, typos corrected, from the shared catalog or this process's index (no query)
+    suggestions = autocomplete(query, limit=10)
+    if suggestions:
+        return JsonResponse({'suggestions': suggestions})
+    
+    # Mid-word matches ("ceta" in "Paracetamol") come from the search index; try the cache first
     cache_key = f'autocomplete_{query}'
     cached_result = cache.get(cache_key)
     if cached_result is not None:
         return JsonResponse({'suggestions': cached_result})
     
-    # Get unique medicine names from donations
-    donation_medicines = Donation.objects.filter(
-        name__icontains=query
-    ).values_list('name', flat=True).distinct()[:5]
-    
-    # Get unique medicine names from generic medicines  
-    generic_medicines = GenericMedicine.objects.filter(
-        name__icontains=query
-    ).values_list('name', flat=True).distinct()[:5]
-    
-    # Combine and deduplicate
-    all_medicines = list(set(list(donation_medicines) + list(generic_medicines)))
-    suggestions = sorted(all_medicines)[:10]  # Limit to 10 suggestions
+    suggestions = get_search_backend().suggest(query, limit=10)
     
     # Cache the result for 5 minutes (300 seconds)
     cache.set(cache_key, suggestions, 300)
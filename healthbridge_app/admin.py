@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import CustomUser, GenericMedicine, BrandMedicine
+from .models import CustomUser, GenericMedicine, BrandMedicine, Job
 
 # NOTE: Donation, ExpiryAlert, and MedicineRequest are now registered in their
 # respective modular apps (donations/admin.py and requests/admin.py)
@@ -122,6 +122,14 @@ admin.site.register(CustomUser, UserAdmin)
 admin.site.register(GenericMedicine)
 admin.site.register(BrandMedicine)
 
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'last_error']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error']
+
 """
 @admin.register(MedicineRequest)
 class MedicineRequestAdmin(admin.ModelAdmin):
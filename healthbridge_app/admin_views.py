@@ -7,9 +7,11 @@ from django.http import JsonResponse
 from django.db.models import Q, Count
 import logging
 
-from donations.models import Donation
+from donations.models import Donation, ExpiryCalendar
 from requests.models import MedicineRequest
+from .jobs import queue_email
 from .models import Notification
+from .services.waste_forecast import get_waste_forecast
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,25 @@ def is_admin(user):
     return user.is_authenticated and user.is_superuser
 
 
+def email_notification(notification):
+    """Email a copy of an approval/rejection notice; the background worker delivers it"""
+    user = notification.user
+    if not user.email:
+        return
+    try:
+        queue_email(
+            subject=f"HealthBridge: {notification.title}",
+            message=(
+                f"Hello {user.get_full_name() or user.username},\n\n"
+                f"{notification.message}\n\n"
+                f"Thank you,\nThe HealthBridge Team"
+            ),
+            recipient_list=[user.email],
+        )
+    except Exception as e:
+        logger.error(f'Could not queue email for notification {notification.id}: {str(e)}')
+
+
 @user_passes_test(is_admin, login_url='/login/')
 def admin_dashboard(request):
     """Main admin dashboard showing pending approvals and statistics"""
@@ -49,6 +70,16 @@ def admin_dashboard(request):
         approval_status=MedicineRequest.ApprovalStatus.REJECTED
     ).count()
     
+    # Read from the per-day calendar rather than scanning the donations table
+    expiring_week = ExpiryCalendar.objects.expiring_within(days=7)
+    
+    # Cached; a failed forecast should not take the dashboard down
+    try:
+        waste_forecast = get_waste_forecast(refresh=request.GET.get('refresh_forecast') == '1')
+    except Exception as e:
+        logger.error(f"Waste forecast failed: {e}")
+        waste_forecast = None
+    
     # Get recent approvals
     recent_approved_donations = Donation.objects.filter(
         approval_status=Donation.ApprovalStatus.APPROVED
@@ -72,6 +103,10 @@ def admin_dashboard(request):
         'approved_requests': approved_requests,
         'rejected_requests': rejected_requests,
         
+        'expiring_week_count': expiring_week['donations'],
+        'expiring_week_units': expiring_week['units'],
+        'waste_forecast': waste_forecast,
+        
         'recent_approved_donations': recent_approved_donations,
         'recent_approved_requests': recent_approved_requests,
     }
@@ -93,13 +128,14 @@ def approve_donation(request, donation_id):
             
             # Create notification for donor
             if donation.donor:
-                Notification.objects.create(
+                notification = Notification.objects.create(
                     user=donation.donor,
                     notification_type=Notification.Type.DONATION_APPROVED,
                     title='Donation Approved! ✅',
                     message=f'Your donation of {donation.quantity}x {donation.name} has been approved and is now available for recipients to request. Approved on {timezone.now().strftime("%B %d, %Y at %I:%M %p")}.',
                     donation_id=donation.id
                 )
+                email_notification(notification)
             
             messages.success(request, f'Donation "{donation.name}" has been approved!')
             logger.info(f'Admin {request.user.email} approved donation {donation.tracking_code}')
@@ -139,13 +175,14 @@ def reject_donation(request, donation_id):
             
             # Create notification for donor
             if donation.donor:
-                Notification.objects.create(
+                notification = Notification.objects.create(
                     user=donation.donor,
                     notification_type=Notification.Type.DONATION_REJECTED,
                     title='Donation Rejected ❌',
                     message=f'Your donation of {donation.quantity}x {donation.name} was rejected. Reason: {reason}',
                     donation_id=donation.id
                 )
+                email_notification(notification)
             
             messages.warning(request, f'Donation "{donation.name}" has been rejected.')
             logger.info(f'Admin {request.user.email} rejected donation {donation.tracking_code}')
@@ -195,13 +232,14 @@ def approve_request(request, request_id):
                 else:
                     message = f'Your request for {medicine_request.quantity}x {medicine_request.medicine_name} has been approved! Contact the clinic for claim details.'
                 
-                Notification.objects.create(
+                notification = Notification.objects.create(
                     user=medicine_request.recipient,
                     notification_type=Notification.Type.REQUEST_APPROVED,
                     title='Request Approved! ✅',
                     message=message,
                     request_id=medicine_request.id
                 )
+                email_notification(notification)
             
             messages.success(request, f'Request for "{medicine_request.medicine_name}" has been approved!')
             logger.info(f'Admin {request.user.email} approved request {medicine_request.tracking_code}')
@@ -241,13 +279,14 @@ def reject_request(request, request_id):
             
             # Create notification for recipient
             if medicine_request.recipient:
-                Notification.objects.create(
+                notification = Notification.objects.create(
                     user=medicine_request.recipient,
                     notification_type=Notification.Type.REQUEST_REJECTED,
                     title='Request Rejected ❌',
                     message=f'Your request for {medicine_request.quantity}x {medicine_request.medicine_name} was rejected. Reason: {reason}',
                     request_id=medicine_request.id
                 )
+                email_notification(notification)
             
             messages.warning(request, f'Request for "{medicine_request.medicine_name}" has been rejected.')
             logger.info(f'Admin {request.user.email} rejected request {medicine_request.tracking_code}')
@@ -0,0 +1,247 @@
+"""
+In-process autocomplete index for medicine names
+Holds every distinct donation, generic and brand medicine name in a sorted
+array so prefix lookups are a bisect instead of two icontains/DISTINCT
+queries. Built lazily on first use and kept current by the save/delete
+signals in signals.py:
+
+    names = get_autocomplete_index().lookup('parac', limit=10)
+
+Where a shared catalog file has been built (medicine_catalog.py),
+`autocomplete()` reads that first and this index only holds the rows
+newer than the catalog (primary keys above its watermarks), so names saved
+since the catalog was compiled are still suggested. It also reads the
+rename/delete counter (MedicineCatalogState) so a catalog that still
+suggests renamed or deleted names gets rebuilt.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+# (app_label.Model, field) pairs whose values are suggested
+SOURCES: List[Tuple[str, str]] = [
+    ('donations.Donation', 'name'),
+    ('healthbridge_app.GenericMedicine', 'name'),
+    ('healthbridge_app.BrandMedicine', 'brand_name'),
+]
+
+# Prefix entries scanned per lookup before ranking; plenty for a 10-row dropdown
+MAX_CANDIDATES = 500
+
+WORD_START = re.compile(r'(?<![\w])\w', re.UNICODE)
+
+
+def normalize(name: str) -> str:
+    """Index key for a name ("  Paracetamol  500mg" -> "paracetamol 500mg")"""
+    return ' '.join((name or '').split()).lower()
+
+
+def word_suffixes(key: str) -> List[str]:
+    """The key from each word start on, so "caff" finds "paracetamol + caffeine" """
+    return [key[match.start():] for match in WORD_START.finditer(key)]
+
+
+class AutocompleteIndex:
+    """
+    Sorted (suffix, key) entries, one per word start of each distinct name.
+    `counts` tracks how many rows carry each name, so deleting one of several
+    donations with the same name keeps it suggested.
+
+    Other processes' writes only arrive through the database, so the index is
+    rebuilt once it is older than AUTOCOMPLETE_INDEX_MAX_AGE seconds.
+
+    `after` ({source label: primary key}) limits it to rows above those keys,
+    and `name_changes` is then the rename/delete count as of the last load
+    plus those made by this process since.
+    """
+
+    def __init__(self, max_age: Optional[float] = None):
+        self.max_age = max_age if max_age is not None else getattr(settings, 'AUTOCOMPLETE_INDEX_MAX_AGE', 600)
+        self.entries: List[Tuple[str, str]] = []
+        self.display: Dict[str, str] = {}
+        self.counts: Counter = Counter()
+        self.loaded_at: Optional[float] = None
+        self.after: Dict[str, int] = {}
+        self.name_changes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def load(self, names: Optional[Iterable[Tuple[str, int]]] = None):
+        """(Re)build from the database, or from (name, row count) pairs"""
+        if names is None:
+            names = self._load_names()
+            if self.after:
+                from .models import MedicineCatalogState
+                self.name_changes = MedicineCatalogState.current()
+        counts, display = Counter(), {}
+        for name, count in names:
+            key = normalize(name)
+            if key:
+                counts[key] += count
+                display.setdefault(key, ' '.join(name.split()))
+        entries = sorted((suffix, key) for key in counts for suffix in word_suffixes(key))
+        with self._lock:
+            self.entries, self.display, self.counts = entries, display, counts
+            self.loaded_at = time.monotonic()
+
+    def _load_names(self) -> List[Tuple[str, int]]:
+        from django.apps import apps
+        from django.db.models import Count
+
+        names = []
+        for label, field in SOURCES:
+            rows = apps.get_model(label).objects.all()
+            if label in self.after:
+                rows = rows.filter(pk__gt=self.after[label])
+            names.extend(rows.values_list(field).annotate(rows=Count('pk')).order_by())
+        return names
+
+    def ensure_loaded(self):
+        with self._lock:
+            stale = not self.loaded or (self.max_age and time.monotonic() - self.loaded_at > self.max_age)
+            if stale:
+                self.load()
+
+    def invalidate(self):
+        """Drop the index; the next lookup rebuilds it"""
+        with self._lock:
+            self.loaded_at = None
+
+    def rebase(self, after: Dict[str, int]):
+        """Only index rows above these primary keys from now on ({} = every row)"""
+        with self._lock:
+            if after != self.after:
+                self.after = dict(after)
+                self.invalidate()
+
+    # ---------- Incremental updates (no-ops until the index is first used) ----------
+
+    def add(self, name: str):
+        key = normalize(name)
+        with self._lock:
+            if not key or not self.loaded:
+                return
+            self.counts[key] += 1
+            if self.counts[key] == 1:
+                self.display[key] = ' '.join(name.split())
+                for suffix in word_suffixes(key):
+                    insort(self.entries, (suffix, key))
+
+    def remove(self, name: str):
+        key = normalize(name)
+        with self._lock:
+            if not key or not self.loaded or key not in self.counts:
+                return
+            self.counts[key] -= 1
+            if self.counts[key] > 0:
+                return
+            del self.counts[key]
+            self.display.pop(key, None)
+            for suffix in word_suffixes(key):
+                position = bisect_left(self.entries, (suffix, key))
+                if position < len(self.entries) and self.entries[position] == (suffix, key):
+                    del self.entries[position]
+
+    def note_name_change(self):
+        """A row's name was changed or deleted by this process"""
+        with self._lock:
+            self.name_changes += 1
+
+    def replace(self, old_name: Optional[str], new_name: Optional[str]):
+        """A row's name changed from old_name to new_name (either may be None)"""
+        if normalize(old_name) == normalize(new_name):
+            return
+        if old_name:
+            self.remove(old_name)
+        if new_name:
+            self.add(new_name)
+
+    # ---------- Lookups ----------
+
+    def lookup(self, query: str, limit: int = 10) -> List[str]:
+        """
+        Names with a word starting with `query`: names that start with it
+        first, then shorter names, then alphabetical
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self.ensure_loaded()
+        with self._lock:
+            entries, display = self.entries, self.display
+            matches = set()
+            position = bisect_left(entries, (prefix,))
+            while position < len(entries) and len(matches) < MAX_CANDIDATES:
+                suffix, key = entries[position]
+                if not suffix.startswith(prefix):
+                    break
+                matches.add(key)
+                position += 1
+            return [display[key] for key in rank(matches, prefix)[:limit]]
+
+
+def rank(keys: Iterable[str], prefix: str) -> List[str]:
+    """Keys that start with `prefix` first, then shorter keys, then alphabetical"""
+    return sorted(keys, key=lambda key: (not key.startswith(prefix), len(key), key))
+
+
+_index = AutocompleteIndex()
+
+
+def get_autocomplete_index() -> AutocompleteIndex:
+    """This process's index"""
+    return _index
+
+
+def autocomplete(query: str, limit: int = 10) -> List[str]:
+    """
+    Prefix suggestions from the shared memory-mapped catalog if one is
+    built, merged with names saved since it was compiled and followed by
+    brands/generics linked to those names; otherwise from this process's
+    index. A query with no matches is retried with its spelling corrected
+    ("paracetem" -> "paracetamol").
+    """
+    from .fuzzy_index import get_fuzzy_index
+
+    names = prefix_lookup(query, limit)
+    if names:
+        return names
+    for corrected in get_fuzzy_index().completions(query):
+        for name in prefix_lookup(corrected, limit):
+            if len(names) >= limit:
+                return names
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def prefix_lookup(query: str, limit: int = 10) -> List[str]:
+    from .medicine_catalog import get_catalog_file, get_medicine_catalog
+
+    catalog = get_medicine_catalog()
+    if catalog is None:
+        _index.rebase({})
+        return _index.lookup(query, limit)
+    # Names saved since the catalog was compiled only exist in this process's index
+    _index.rebase(catalog.watermarks)
+    found = {normalize(name): name for name in catalog.lookup(query, limit)}
+    for name in _index.lookup(query, limit):
+        found.setdefault(normalize(name), name)
+    names = [found[key] for key in rank(found, normalize(query))[:limit]]
+    if _index.counts or _index.name_changes > catalog.name_changes:
+        get_catalog_file().rebuild_if_due()
+    for name in list(names):
+        for related in catalog.related(name):
+            if len(names) >= limit:
+                return names
+            if related not in names:
+                names.append(related)
+    return names
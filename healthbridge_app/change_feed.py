@@ -0,0 +1,137 @@
+"""
+Change feed for donation and medicine request events
+On PostgreSQL, row triggers publish compact NOTIFY payloads that listeners
+receive within milliseconds. On SQLite (local development and tests) the same
+API falls back to polling the last_update/updated_at watermarks.
+"""
+import json
+import logging
+import select
+import threading
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'healthbridge_changes'
+
+# Tables with NOTIFY triggers (installed by migration 0010_change_feed_triggers)
+WATCHED_TABLES = ['donations_donation', 'healthbridge_app_medicinerequest']
+
+
+class ChangeEvent(NamedTuple):
+    """A row change: table name, INSERT/UPDATE/DELETE and primary key"""
+    table: str
+    op: str
+    id: int
+
+
+class ChangeFeed:
+    """
+    Iterate over change events:
+
+        feed = ChangeFeed()
+        for event in feed.listen():
+            ...
+
+    `listen()` blocks until `stop()` is called from another thread.
+    """
+
+    def __init__(self, using: str = 'default', poll_interval: float = 5.0,
+                 tables: Optional[Iterable[str]] = None):
+        self.using = using
+        self.poll_interval = poll_interval
+        self.tables = set(tables) if tables else set(WATCHED_TABLES)
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def listen(self) -> Iterator[ChangeEvent]:
+        if connections[self.using].vendor == 'postgresql':
+            events = self._listen_postgres()
+        else:
+            events = self._poll_watermarks()
+        for event in events:
+            if event.table in self.tables:
+                yield event
+
+    def _listen_postgres(self) -> Iterator[ChangeEvent]:
+        # LISTEN needs its own autocommit connection, separate from request/ORM use
+        wrapper = connections.create_connection(self.using)
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            raw = wrapper.connection
+
+            while not self.stop_event.is_set():
+                if hasattr(raw, 'poll'):
+                    # psycopg2
+                    ready, _, _ = select.select([raw], [], [], self.poll_interval)
+                    if not ready:
+                        continue
+                    raw.poll()
+                    notifies = list(raw.notifies)
+                    raw.notifies.clear()
+                else:
+                    # psycopg 3
+                    notifies = list(raw.notifies(timeout=self.poll_interval))
+
+                for notify in notifies:
+                    event = self._parse(notify.payload)
+                    if event:
+                        yield event
+        finally:
+            wrapper.close()
+
+    def _poll_watermarks(self) -> Iterator[ChangeEvent]:
+        from donations.models import Donation
+        from requests.models import MedicineRequest
+
+        sources = [
+            (Donation, 'donated_at', 'last_update'),
+            (MedicineRequest, 'created_at', 'updated_at'),
+        ]
+        watermarks = {model: timezone.now() for model, _, _ in sources}
+
+        while not self.stop_event.is_set():
+            for model, created_field, updated_field in sources:
+                since = watermarks[model]
+                rows = list(
+                    model.objects.filter(**{f'{updated_field}__gt': since})
+                    .order_by(updated_field)
+                    .values_list('id', created_field, updated_field)
+                )
+                for row_id, created, updated in rows:
+                    watermarks[model] = max(watermarks[model], updated)
+                    yield ChangeEvent(model._meta.db_table, 'INSERT' if created > since else 'UPDATE', row_id)
+            self.stop_event.wait(self.poll_interval)
+
+    @staticmethod
+    def _parse(payload: str) -> Optional[ChangeEvent]:
+        try:
+            data = json.loads(payload)
+            return ChangeEvent(data['table'], data['op'], int(data['id']))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed change notification: {payload!r}")
+            return None
+
+
+def start_listener(callback: Callable[[ChangeEvent], None], **feed_options) -> ChangeFeed:
+    """Run `callback` for every change event on a daemon thread. Call `.stop()` on the result to end it."""
+    feed = ChangeFeed(**feed_options)
+
+    def run():
+        try:
+            for event in feed.listen():
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Change feed callback failed for {event}: {e}")
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name='change-feed', daemon=True).start()
+    return feed
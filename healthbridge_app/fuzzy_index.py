@@ -0,0 +1,295 @@
+"""
+Typo-tolerant medicine name matching for HealthBridge
+Recipients type "paracetemol" or "amoxicilin"; an exact search finds
+nothing and they request a medicine that is in stock. This module corrects
+each word of a query against the words of every known medicine name:
+
+    index = get_fuzzy_index()
+    index.correct('paracetemol 500')     # 'paracetamol 500'
+    medicines, corrected = fuzzy_filter(queryset, 'name', 'amoxicilin')
+
+Candidates come from a character trigram inverted index over the
+vocabulary and are verified with a banded edit distance that gives up as
+soon as the bound is exceeded, so a lookup touches a few hundred words at
+most and never scans a table. The vocabulary is capped at
+FUZZY_INDEX_MAX_WORDS (catalogue words first, then the most common).
+"""
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .autocomplete_index import SOURCES, normalize
+
+logger = logging.getLogger(__name__)
+
+# Letters-only words of 3+ characters make up the vocabulary; strengths ("500mg") are left as typed
+WORD = re.compile(r'[^\W\d_]{3,}')
+TOKEN = re.compile(r'\w+')
+
+# Shortest query word that is corrected; shorter words have too many neighbours
+MIN_FUZZY_LENGTH = 4
+# Corrections tried per query word when completing a prefix
+PREFIX_ALTERNATIVES = 3
+
+
+def max_edits(word: str) -> int:
+    """Edits allowed for a word of this length: 1 up to 7 letters, 2 beyond"""
+    if len(word) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def trigrams(word: str) -> List[str]:
+    """Trigrams of the word with its start marked, so a prefix shares its word's leading grams"""
+    padded = f"$${word}"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def bounded_distance(a: str, b: str, limit: int, prefix: bool = False) -> Optional[int]:
+    """
+    Levenshtein distance between `a` and `b` (with prefix=True, between `a`
+    and the closest prefix of `b`), or None if it is more than `limit`.
+    Only the diagonal band |i - j| <= limit is computed and the loop stops
+    as soon as a whole row exceeds the limit.
+    """
+    if prefix:
+        b = b[:len(a) + limit]
+    elif abs(len(a) - len(b)) > limit:
+        return None
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            current[j] = min(
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+                previous[j] + 1,
+                current[j - 1] + 1,
+                over,
+            )
+        if min(current) > limit:
+            return None
+        previous = current
+    distance = min(previous) if prefix else previous[-1]
+    return distance if distance <= limit else None
+
+
+class FuzzyIndex:
+    """
+    Vocabulary of medicine name words with a trigram -> word ids inverted
+    index. Built on a background thread at first use, so no request waits
+    for it (queries simply go uncorrected until it is ready), and rebuilt
+    the same way once older than AUTOCOMPLETE_INDEX_MAX_AGE while the old
+    one keeps answering.
+    """
+
+    def __init__(self, max_words: Optional[int] = None, max_age: Optional[float] = None):
+        self.max_words = max_words or getattr(settings, 'FUZZY_INDEX_MAX_WORDS', 50000)
+        self.max_age = max_age if max_age is not None else getattr(settings, 'AUTOCOMPLETE_INDEX_MAX_AGE', 600)
+        self.words: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.weights: List[Tuple[bool, int]] = []
+        self.postings: Dict[str, array] = {}
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def load(self, names: Optional[List[Tuple[str, bool]]] = None):
+        """(Re)build from the database, or from (name, is catalogue name) pairs"""
+        started = time.perf_counter()
+        counts, catalogue = Counter(), set()
+        for name, from_catalogue in (self._load_names() if names is None else names):
+            words = set(WORD.findall(normalize(name)))
+            counts.update(words)
+            if from_catalogue:
+                catalogue.update(words)
+        # Catalogue spellings always stay in; the rest compete on how many names use them
+        ranked = sorted(counts, key=lambda word: (word not in catalogue, -counts[word], word))[:self.max_words]
+
+        words, ids, weights, postings = [], {}, [], {}
+        for word in ranked:
+            self._insert(word, word in catalogue, counts[word], words, ids, weights, postings)
+        with self._lock:
+            self.words, self.ids, self.weights, self.postings = words, ids, weights, postings
+            self.loaded_at = time.monotonic()
+        logger.info(f"Fuzzy index: {len(words)} words in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def _load_names(self):
+        from django.apps import apps
+
+        for label, field in SOURCES:
+            from_catalogue = not label.startswith('donations.')
+            rows = apps.get_model(label).objects.values_list(field, flat=True).distinct().order_by()
+            for name in rows.iterator(chunk_size=5000):
+                yield name, from_catalogue
+
+    @staticmethod
+    def _insert(word, from_catalogue, count, words, ids, weights, postings):
+        ids[word] = len(words)
+        words.append(word)
+        weights.append((from_catalogue, count))
+        for gram in set(trigrams(word)):
+            postings.setdefault(gram, array('I')).append(ids[word])
+
+    def ensure_loaded(self):
+        if not self.loaded or (self.max_age and time.monotonic() - self.loaded_at > self.max_age):
+            self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            from django.db import connection
+            try:
+                self.load()
+            except Exception as e:
+                logger.warning(f"Fuzzy index build failed: {e}")
+            finally:
+                self._refreshing = False
+                connection.close()
+
+        threading.Thread(target=refresh, name='fuzzy-index', daemon=True).start()
+
+    def add(self, name: str):
+        """Add the words of a newly saved name (no-op until the index is first used, or once it is full)"""
+        with self._lock:
+            if not self.loaded:
+                return
+            for word in set(WORD.findall(normalize(name))):
+                if word not in self.ids and len(self.words) < self.max_words:
+                    self._insert(word, False, 1, self.words, self.ids, self.weights, self.postings)
+
+    # ---------- Lookups ----------
+
+    def candidates(self, token: str, prefix: bool = False, limit: int = 5) -> List[str]:
+        """
+        Vocabulary words within max_edits(token) of `token` (or, with
+        prefix=True, that start within that distance of it), closest first
+        """
+        limit_edits = max_edits(token)
+        if not limit_edits:
+            return []
+        self.ensure_loaded()
+        grams = set(trigrams(token))
+        # Each edit changes at most three trigrams
+        needed = max(len(grams) - 3 * limit_edits, 1)
+        with self._lock:
+            words, weights, postings = self.words, self.weights, self.postings
+        shared = Counter()
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is not None:
+                shared.update(posting)
+
+        matches = []
+        for word_id, count in shared.items():
+            if count < needed:
+                continue
+            distance = bounded_distance(token, words[word_id], limit_edits, prefix=prefix)
+            if distance is not None:
+                from_catalogue, frequency = weights[word_id]
+                matches.append((distance, not from_catalogue, -frequency, words[word_id]))
+        matches.sort()
+        return [match[3] for match in matches[:limit]]
+
+    def correct_word(self, token: str, prefix: bool = False) -> Optional[str]:
+        """`token` if it is a known word, else its closest correction, else None"""
+        self.ensure_loaded()
+        if token in self.ids or not WORD.fullmatch(token) or len(token) < MIN_FUZZY_LENGTH:
+            return token
+        found = self.candidates(token, prefix=prefix, limit=1)
+        return found[0] if found else None
+
+    def correct(self, query: str) -> Optional[str]:
+        """The query with every misspelled word corrected, or None if nothing could be corrected"""
+        tokens = TOKEN.findall(normalize(query))
+        corrected = [self.correct_word(token) for token in tokens]
+        if not tokens or corrected == tokens or None in corrected:
+            return None
+        return ' '.join(corrected)
+
+    def alternatives(self, query: str) -> List[str]:
+        """
+        Search strings to try, best first, when `query` matches nothing as
+        typed: the corrected query, then each of its words (longest first),
+        so "biogesic 500" still finds "Biogesic"
+        """
+        tokens = TOKEN.findall(normalize(query))
+        corrected = [self.correct_word(token) for token in tokens]
+        alternatives = []
+        full = self.correct(query)
+        if full:
+            alternatives.append(full)
+        words = sorted(
+            {word for word in corrected if word and WORD.fullmatch(word) and len(word) >= MIN_FUZZY_LENGTH},
+            key=lambda word: (-len(word), word),
+        )
+        for word in words:
+            if word not in alternatives and word != normalize(query):
+                alternatives.append(word)
+        return alternatives
+
+    def completions(self, query: str) -> List[str]:
+        """Corrected versions of a partly typed query, for prefix lookups ("paracetem" -> "paracetam")"""
+        tokens = TOKEN.findall(normalize(query))
+        if not tokens:
+            return []
+        head = [self.correct_word(token) for token in tokens[:-1]]
+        if None in head:
+            return []
+        last = tokens[-1]
+        # The completed word itself is the best prefix to look up
+        return [
+            ' '.join(head + [word]) for word in self.candidates(last, prefix=True, limit=PREFIX_ALTERNATIVES)
+            if word != last
+        ]
+
+
+_index = FuzzyIndex()
+
+
+def get_fuzzy_index() -> FuzzyIndex:
+    """This process's index"""
+    return _index
+
+
+def fuzzy_filter(queryset, field: str, query: str):
+    """
+    search_backend filter() that retries with corrected spellings when the
+    query matches nothing as typed, then with the generic of a brand (or the
+    brands of a generic) from the shared catalog. Returns (results, the
+    search string that matched if it was not the query).
+    """
+    from .medicine_catalog import get_medicine_catalog
+    from .search_backend import get_search_backend
+
+    search = get_search_backend()
+    results = search.filter(queryset, field, query)
+    if not query.strip() or results.exists():
+        return results, None
+    alternatives = get_fuzzy_index().alternatives(query)
+    catalog = get_medicine_catalog()
+    if catalog is not None:
+        alternatives += [
+            related for name in (alternatives or [query]) for related in catalog.related(name)
+        ]
+    for alternative in alternatives:
+        corrected = search.filter(queryset, field, alternative)
+        if corrected.exists():
+            return corrected, alternative
+    return results, None
@@ -0,0 +1,204 @@
+"""
+Database-backed background job queue for HealthBridge
+Request handlers enqueue jobs; `manage.py run_worker` claims and runs them
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def job(name):
+    """Register a function as the handler for jobs called `name`"""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=None, delay=None, **payload):
+    """
+    Queue a job. The row is written in the caller's transaction, so a job
+    enqueued inside a rolled-back request never runs.
+    """
+    if name not in _handlers:
+        raise ValueError(f"Unknown job: {name}")
+
+    if getattr(settings, 'JOB_QUEUE_EAGER', False):
+        # Local development without a worker: run right after commit
+        transaction.on_commit(lambda: _handlers[name](**payload))
+        return None
+
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+        run_at=timezone.now() + (delay or timedelta()),
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base ... capped"""
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'JOB_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** max(attempts - 1, 0)))
+
+
+def claim_jobs(worker_id, limit=10):
+    """
+    Claim up to `limit` due jobs for this worker.
+    Uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never
+    pick the same row (on SQLite the conditional UPDATE does the same job).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.QUEUED, run_at__lte=now)
+            .order_by('run_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, status=Job.Status.RUNNING, locked_by=worker_id))
+
+
+def run_job(job_obj):
+    """Run a claimed job and record its outcome, scheduling a retry on failure"""
+    handler = _handlers.get(job_obj.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job '{job_obj.name}'")
+        handler(**job_obj.payload)
+    except Exception as e:
+        job_obj.last_error = traceback.format_exc()
+        if job_obj.attempts < job_obj.max_attempts:
+            job_obj.status = Job.Status.QUEUED
+            job_obj.run_at = timezone.now() + retry_delay(job_obj.attempts)
+            logger.warning(f"Job {job_obj} failed (attempt {job_obj.attempts}), retrying at {job_obj.run_at}: {e}")
+        else:
+            job_obj.status = Job.Status.FAILED
+            job_obj.finished_at = timezone.now()
+            logger.error(f"Job {job_obj} failed permanently after {job_obj.attempts} attempts: {e}")
+    else:
+        job_obj.status = Job.Status.SUCCEEDED
+        job_obj.finished_at = timezone.now()
+        job_obj.last_error = ""
+
+    job_obj.locked_by = ""
+    job_obj.locked_at = None
+    job_obj.save(update_fields=['status', 'run_at', 'last_error', 'finished_at', 'locked_by', 'locked_at'])
+    return job_obj.status == Job.Status.SUCCEEDED
+
+
+def requeue_stale_jobs(timeout=None):
+    """
+    Put jobs back in the queue whose worker died mid-run. A job that has
+    used up its attempts this way (e.g. it keeps killing or hanging its
+    worker) is failed instead, so it is not retried forever.
+    """
+    timeout = timeout or timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 900))
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=now - timeout)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED,
+        finished_at=now,
+        last_error=f"Worker stopped responding (lock older than {timeout}) on the last allowed attempt",
+        locked_by="",
+        locked_at=None,
+    )
+    if failed:
+        logger.error(f"Failed {failed} stale job(s) that ran out of attempts")
+    return stale.filter(attempts__lt=F('max_attempts')).update(status=Job.Status.QUEUED, locked_by="", locked_at=None)
+
+
+def work(worker_id, batch_size=10):
+    """Claim and run one batch of jobs. Returns the number of jobs processed."""
+    jobs = claim_jobs(worker_id, limit=batch_size)
+    for job_obj in jobs:
+        run_job(job_obj)
+    return len(jobs)
+
+
+# ---------- JOB HANDLERS ----------
+
+@job('expiry.alert_donation')
+def alert_donation(donation_id):
+    """Send expiry alerts for a single donation"""
+    from .services.expiry_service import alert_expiring_donation
+    alert_expiring_donation(donation_id)
+
+
+@job('mail.send')
+def send_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """Deliver one transactional email; a failure is retried by the queue with backoff"""
+    from django.core.mail import send_mail
+    send_mail(
+        subject,
+        message,
+        from_email or settings.DEFAULT_FROM_EMAIL,
+        recipient_list,
+        html_message=html_message,
+        fail_silently=False,
+    )
+
+
+@job('auth.password_reset_email')
+def send_password_reset_email(user_id, domain, site_name, protocol, subject_template_name,
+                              email_template_name, html_email_template_name=None, from_email=None):
+    """Render and send a password reset email queued by QueuedPasswordResetForm"""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.tokens import default_token_generator
+    from django.core.mail import EmailMultiAlternatives
+    from django.template import loader
+    from django.utils.encoding import force_bytes
+    from django.utils.http import urlsafe_base64_encode
+
+    user = get_user_model()._default_manager.filter(pk=user_id, is_active=True).first()
+    if user is None or not user.email:
+        logger.info(f"Skipping password reset email for user {user_id}: no active user with an email")
+        return
+
+    context = {
+        'email': user.email,
+        'domain': domain,
+        'site_name': site_name,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'user': user,
+        'token': default_token_generator.make_token(user),
+        'protocol': protocol,
+    }
+    subject = ''.join(loader.render_to_string(subject_template_name, context).splitlines())
+    body = loader.render_to_string(email_template_name, context)
+    message = EmailMultiAlternatives(subject, body, from_email, [user.email])
+    if html_email_template_name:
+        message.attach_alternative(loader.render_to_string(html_email_template_name, context), 'text/html')
+    message.send()
+
+
+def queue_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """Send an email from the background worker instead of the current request"""
+    return enqueue(
+        'mail.send',
+        subject=subject,
+        message=message,
+        recipient_list=list(recipient_list),
+        from_email=from_email,
+        html_message=html_message,
+    )
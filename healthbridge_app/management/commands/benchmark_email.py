@@ -0,0 +1,162 @@
+"""
+Management command to measure expiry email throughput against a local SMTP sink.
+Seeds donations and staff users inside a transaction that is rolled back,
+runs check_expiry end to end and reports messages/s, connections and latency.
+Usage: python manage.py benchmark_email [--donations 500] [--staff 5] [--chunk-size 50,100] [--concurrency 1,4]
+"""
+import json
+import time
+from io import StringIO
+from uuid import uuid4
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from donations.models import Donation
+from healthbridge_app.management.commands.check_expiry import Command as CheckExpiryCommand
+from healthbridge_app.services.run_profiler import percentile
+from healthbridge_app.services.smtp_sink import SMTPSink
+
+
+def parse_int_list(value):
+    try:
+        numbers = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise CommandError(f"Expected comma-separated numbers, got '{value}'")
+    if not numbers or min(numbers) < 1:
+        raise CommandError(f"Expected positive numbers, got '{value}'")
+    return numbers
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the expiry email pipeline against an in-process SMTP sink (nothing is kept or sent out)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donations', type=int, default=500, help='Expiring donations to seed (default: 500)')
+        parser.add_argument('--staff', type=int, default=5, help='Staff users to seed; each gets every alert (default: 5)')
+        parser.add_argument('--days', type=int, default=10, help='Spread seeded expiry dates over this many days (default: 10)')
+        parser.add_argument(
+            '--chunk-size',
+            default=str(CheckExpiryCommand.email_chunk_size),
+            help='Emails per dispatcher chunk; comma-separated to compare several (e.g. 25,100)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            default='4',
+            help='SMTP connections in parallel; comma-separated to compare several (e.g. 1,4,8)'
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=0.0,
+            help='Delay the sink adds before accepting each message, to mimic a remote provider'
+        )
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        chunk_sizes = parse_int_list(options['chunk_size'])
+        concurrencies = parse_int_list(options['concurrency'])
+        days = options['days']
+        results = []
+
+        with SMTPSink(latency=options['latency_ms'] / 1000) as sink:
+            with transaction.atomic():
+                self.seed(options['donations'], options['staff'], days)
+                for chunk_size in chunk_sizes:
+                    for concurrency in concurrencies:
+                        results.append(self.run_once(sink, chunk_size, concurrency, days))
+                # Leave no benchmark data (donations, users, alerts, run ledger) behind
+                transaction.set_rollback(True)
+
+        self.summary = results
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'chunk':>6} {'conc':>5} {'emails':>7} {'secs':>7} {'msg/s':>8} {'msg/min':>8} "
+            f"{'conns':>6} {'p50 ms':>7} {'p99 ms':>7} {'failed':>6}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['chunk_size']:>6} {result['concurrency']:>5} {result['emails']:>7} "
+                f"{result['seconds']:>7} {result['messages_per_second']:>8} {result['messages_per_minute']:>8} "
+                f"{result['connections']:>6} {result['p50_ms'] or '-':>7} {result['p99_ms'] or '-':>7} "
+                f"{result['failed']:>6}"
+            )
+        best = max(results, key=lambda result: result['messages_per_second'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Best: {best['messages_per_second']} msg/s with chunk size {best['chunk_size']} "
+                f"and concurrency {best['concurrency']}"
+            )
+        )
+
+    def seed(self, donations, staff, days):
+        """Bulk insert benchmark staff and donations (no save signals, so no jobs are queued)"""
+        User = get_user_model()
+        run_id = uuid4().hex[:8]
+        User.objects.bulk_create([
+            User(
+                username=f"bench-{run_id}-{i}",
+                email=f"bench-{run_id}-{i}@example.com",
+                first_name="Benchmark",
+                last_name=f"Staff {i}",
+                is_staff=True,
+                password='!',
+            )
+            for i in range(staff)
+        ])
+        today = date.today()
+        Donation.objects.bulk_create([
+            Donation(
+                name=f"Benchmark medicine {i}",
+                quantity=1,
+                expiry_date=today + timedelta(days=i % (days + 1)),
+                status=Donation.Status.AVAILABLE,
+                approval_status=Donation.ApprovalStatus.APPROVED,
+                tracking_code=uuid4().hex[:12].upper(),
+            )
+            for i in range(donations)
+        ], batch_size=1000)
+
+    def run_once(self, sink, chunk_size, concurrency, days):
+        """One full check_expiry run with the given dispatcher settings"""
+        connections_before, messages_before = sink.connections, sink.messages
+        command = CheckExpiryCommand()
+        command.email_chunk_size = chunk_size
+
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=sink.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_MAX_CONCURRENCY=concurrency,
+        ):
+            started = time.perf_counter()
+            # --force resends every alert, so each run in the grid sends the same emails
+            call_command(command, days=days, force=True, channel='email', lock_mode='none', stdout=StringIO())
+            seconds = time.perf_counter() - started
+
+        emails = sink.messages - messages_before
+        latencies = command.email_latencies
+        return {
+            'chunk_size': chunk_size,
+            'concurrency': concurrency,
+            'emails': emails,
+            'seconds': round(seconds, 2),
+            'messages_per_second': round(emails / seconds, 1) if seconds else None,
+            'messages_per_minute': round(emails / seconds * 60) if seconds else None,
+            'connections': sink.connections - connections_before,
+            'retried': command.send_stats['retried'],
+            'failed': command.send_stats['failed'],
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        }
@@ -0,0 +1,33 @@
+"""
+Management command to compile the shared medicine name catalog that web workers mmap.
+The file is replaced atomically and only when its contents changed.
+Usage: python manage.py build_medicine_catalog [--path /var/lib/healthbridge/medicine_catalog.bin] [--force]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from healthbridge_app.medicine_catalog import compile_catalog
+
+
+class Command(BaseCommand):
+    help = 'Compile donation, generic and brand medicine names into the memory-mapped catalog file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Where to write the catalog (default: MEDICINE_CATALOG_PATH)')
+        parser.add_argument('--force', action='store_true', help='Rewrite the file even if nothing changed')
+
+    def handle(self, *args, **options):
+        try:
+            result = compile_catalog(options['path'], force=options['force'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.summary = result
+
+        if not result['changed']:
+            self.stdout.write(f"Medicine catalog {result['version']} is up to date ({result['names']} names).")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote medicine catalog {result['version']} to {result['path']}: {result['names']} names, "
+                f"{result['edges']} brand links, {result['bytes']} bytes."
+            )
+        )
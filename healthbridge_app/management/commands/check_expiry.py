@@ -1,15 +1,101 @@
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 from django.core.management.base import BaseCommand, CommandError
-from django.core.mail import send_mail, send_mass_mail
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.db import transaction
-from donations.models import Donation, ExpiryAlert
+from django.db import connections
+from django.utils import timezone
+from donations.models import ExpiryRun
+from healthbridge_app.run_lock import RunLock, describe_holder
+from healthbridge_app.services.expiry_planner import (
+    CHANNELS,
+    EMAIL,
+    ExpiryAlertPlanner,
+    MilestonePolicy,
+    chunked,
+    group_by_recipient,
+    parse_shard,
+)
+from healthbridge_app.services.mail_dispatcher import MailDispatcher
+from healthbridge_app.services.run_profiler import NULL_PROFILER, RunProfiler
+
+
+def _init_shard_worker():
+    """Make sure Django is set up in worker processes started without fork"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def run_shard(planner_options, dry_run, digest, profile=False, email_concurrency=None, plan_only=False):
+    """
+    Process one shard in a worker process, sending over at most
+    `email_concurrency` SMTP connections. In digest (or plan_only) mode the
+    shard only plans and records; the parent sends the emails.
+    """
+    command = Command()
+    command.email_concurrency = email_concurrency
+    if profile:
+        command.profiler = RunProfiler()
+    planner = ExpiryAlertPlanner(profiler=command.profiler, **planner_options)
+    with command.profiler.capture_queries():
+        if digest or plan_only:
+            planned, summary = command.plan_alerts(planner, dry_run)
+        else:
+            planned, summary = [], command.process_expiry_notifications(planner, dry_run)
+    command.write_output_summary()
+    if profile:
+        summary['profile'] = command.profiler.report()
+    return planned, summary
+
+
+def expiry_lock_name(shard_spec=None):
+    """Lock shared by every run over the same donations"""
+    return f"check_expiry:{shard_spec}" if shard_spec else "check_expiry"
+
+
+def expiry_run_locks(shard_spec=None):
+    """
+    Locks a run holds while it writes ExpiryAlerts. Everything holds the
+    common check_expiry lock: full runs and single-donation alerts
+    exclusively; --shard runs shared, so shards of one run can go in
+    parallel but never alongside a full run, plus their own shard lock so
+    the same shard never runs twice.
+    """
+    if not shard_spec:
+        return [RunLock(expiry_lock_name())]
+    return [RunLock(expiry_lock_name(), shared=True), RunLock(expiry_lock_name(shard_spec))]
+
+
+def merge_summaries(summaries):
+    """Add up the per-shard counts"""
+    merged = {'donations_scanned': 0, 'alerts_planned': 0, 'emails_sent': 0, 'notifications_created': 0}
+    for summary in summaries:
+        for key in merged:
+            merged[key] += summary.get(key, 0)
+    return merged
 
 
 class Command(BaseCommand):
     help = 'Check for medicines expiring within specified days and send notifications'
     
+    # Emails handed to a dispatcher worker at a time
+    email_chunk_size = 100
+    # SMTP connections this process may open at once (None = EMAIL_MAX_CONCURRENCY)
+    email_concurrency = None
+    
+    # Defaults for instances created outside call_command (shard workers, services)
+    verbosity = 1
+    profiler = NULL_PROFILER
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dry_run_counts = Counter()
+        self.send_stats = Counter()
+        self.email_latencies = []
+    
     def add_arguments(self, parser):
         parser.add_argument(
             '--days',
@@ -32,126 +118,436 @@ class Command(BaseCommand):
             action='store_true',
             help='Only send alerts for medicines expiring in 3 days or less'
         )
+        parser.add_argument(
+            '--digest',
+            action='store_true',
+            help='Send one digest email per recipient instead of one email per medicine'
+        )
+        parser.add_argument(
+            '--milestones',
+            type=str,
+            default=None,
+            help='Comma-separated days before expiry to alert at (default: EXPIRY_ALERT_MILESTONES, e.g. 10,7,3,1,0)'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only check donations changed or crossing a milestone since the last successful run'
+        )
+        parser.add_argument(
+            '--channel',
+            choices=CHANNELS + ['both'],
+            default=None,
+            help='Send alerts by email, as in-app dashboard notifications for donors, or both '
+                 '(default: EXPIRY_ALERT_CHANNELS)'
+        )
+        parser.add_argument(
+            '--email-levels',
+            type=str,
+            default=None,
+            help='Comma-separated urgency levels that also get an email, e.g. critical,high '
+                 '(default: EXPIRY_EMAIL_LEVELS, empty means all)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Split donations into this many shards processed in parallel processes (default: 1)'
+        )
+        parser.add_argument(
+            '--shard',
+            type=str,
+            default=None,
+            help='Only process shard INDEX/COUNT of the donations, e.g. 0/3, to spread a run across several nodes'
+        )
+        parser.add_argument(
+            '--lock-mode',
+            choices=['skip', 'wait', 'coalesce', 'none'],
+            default='skip',
+            help='What to do when another run is in progress: skip this run (default), wait for it, '
+                 'wait and skip if a newer run already covered this one (coalesce), or ignore the lock (none)'
+        )
+        parser.add_argument(
+            '--lock-timeout',
+            type=float,
+            default=900,
+            help='Seconds to wait for the run lock in wait/coalesce mode (default: 900)'
+        )
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Report time per phase, query count/time and SMTP latency as JSON'
+        )
+        parser.add_argument(
+            '--profile-output',
+            type=str,
+            default=None,
+            help='Write the --profile report to this file instead of stdout'
+        )
     
     def handle(self, *args, **options):
         days_ahead = options['days']
         dry_run = options['dry_run']
         force = options['force']
         critical_only = options['critical_only']
+        digest = options.get('digest', False)
+        incremental = options.get('incremental', False)
+        workers = options.get('workers') or 1
+        shard_spec = options.get('shard')
+        self.verbosity = options.get('verbosity', 1)
+        self.profiler = RunProfiler() if options.get('profile') else NULL_PROFILER
+        self.dry_run_counts = Counter()
+        self.send_stats = Counter()
+        self.email_latencies = []
+        
+        try:
+            policy = (
+                MilestonePolicy.parse(options['milestones'])
+                if options.get('milestones') else MilestonePolicy.from_settings()
+            )
+        except ValueError as e:
+            raise CommandError(f"Invalid --milestones value: {e}")
+        
+        channel = options.get('channel') or getattr(settings, 'EXPIRY_ALERT_CHANNELS', EMAIL)
+        channels = CHANNELS if channel == 'both' else [channel]
+        email_levels = options.get('email_levels')
+        if email_levels is None:
+            email_levels = getattr(settings, 'EXPIRY_EMAIL_LEVELS', None)
+        if isinstance(email_levels, str):
+            email_levels = [level.strip().lower() for level in email_levels.split(',') if level.strip()]
+        email_levels = email_levels or None
+        
+        shard = None
+        if shard_spec:
+            try:
+                shard = parse_shard(shard_spec)
+            except ValueError as e:
+                raise CommandError(f"Invalid --shard value: {e}")
+            shard_spec = f"{shard[0]}/{shard[1]}"
+            if workers > 1:
+                raise CommandError("--shard and --workers cannot be combined")
+        if workers < 1:
+            raise CommandError("--workers must be at least 1")
         
         if critical_only:
             days_ahead = min(days_ahead, 3)
             self.stdout.write(f"Critical mode: checking medicines expiring within {days_ahead} days")
         
+        planner = ExpiryAlertPlanner(
+            days_ahead=days_ahead,
+            force=force,
+            policy=policy,
+            shard=shard,
+            channels=channels,
+            email_levels=email_levels,
+            profiler=self.profiler,
+        )
+        parameters = {
+            'force': force,
+            'critical_only': critical_only,
+            'digest': digest,
+            'milestones': policy.milestones,
+            'workers': workers,
+            'channels': channels,
+            'email_levels': sorted(email_levels) if email_levels else None,
+        }
+        if shard_spec:
+            parameters['shard'] = shard_spec
+        
+        # Dry runs neither record nor send anything, so they never take the lock
+        lock_mode = 'none' if dry_run else options.get('lock_mode', 'skip')
+        locks = []
+        if lock_mode != 'none':
+            locks = self.acquire_run_locks(
+                expiry_run_locks(shard_spec), lock_mode, options.get('lock_timeout', 900), planner, shard_spec
+            )
+            if locks is None:
+                return
+        
+        try:
+            with self.profiler.capture_queries():
+                self.run_expiry_check(planner, dry_run, digest, incremental, workers, parameters, shard_spec)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        
+        if self.profiler.enabled:
+            self.write_profile(options.get('profile_output'), parameters=parameters, summary=self.summary)
+    
+    def write_profile(self, path, **extra):
+        """Write the profiling report as JSON to stdout or a file"""
+        report = json.dumps(self.profiler.report(**extra), indent=2, default=str)
+        if path:
+            with open(path, 'w', encoding='utf-8') as profile_file:
+                profile_file.write(report)
+            self.stdout.write(f"Profile written to {path}")
+        else:
+            self.stdout.write(report)
+    
+    def acquire_run_locks(self, locks, lock_mode, timeout, planner, shard_spec=None):
+        """Take every run lock in order, or return None (holding none) if this run should be skipped"""
+        requested_at = timezone.now()
+        held = []
         try:
-            notifications_sent = self.process_expiry_notifications(
-                days_ahead, dry_run, force
+            for lock in locks:
+                if not self.acquire_run_lock(lock, lock_mode, timeout):
+                    return None
+                held.append(lock)
+        finally:
+            if len(held) < len(locks):
+                for lock in reversed(held):
+                    lock.release()
+        
+        if lock_mode == 'coalesce':
+            # Several waiters collapse into one follow-up run: the first one to get
+            # the lock does the work, the rest see its run and stop
+            newer_run = self.last_covering_run(planner, shard_spec)
+            if newer_run and newer_run.started_at >= requested_at:
+                for lock in reversed(held):
+                    lock.release()
+                self.stdout.write(f"Run #{newer_run.pk} started after this one was requested; nothing left to do.")
+                self.summary = {'skipped': True, 'coalesced_into': newer_run.pk}
+                return None
+        return held
+    
+    def last_covering_run(self, planner, shard_spec=None):
+        """Latest successful run over the same window, shard, channels and email levels (or more)"""
+        return ExpiryRun.objects.last_successful(
+            planner.days_ahead,
+            shard=shard_spec,
+            channels=planner.channels,
+            email_levels=planner.email_levels,
+        )
+    
+    def acquire_run_lock(self, lock, lock_mode, timeout):
+        """Take one run lock: False (after recording why) if this run should be skipped"""
+        if lock.acquire():
+            return True
+        
+        holder = lock.holder()
+        if lock_mode == 'skip':
+            self.stdout.write(
+                self.style.WARNING(f"Another expiry run is in progress ({describe_holder(holder)}); skipping.")
             )
-            
-            if dry_run:
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Dry run completed. Would have sent {notifications_sent} notifications."
-                    )
-                )
+            self.summary = {'skipped': True, 'lock_holder': holder}
+            return False
+        
+        self.stdout.write(f"Waiting up to {timeout:.0f}s for the run in progress ({describe_holder(holder)})...")
+        if not lock.acquire(wait=timeout):
+            raise CommandError(f"Timed out after {timeout:.0f}s waiting for run lock '{lock.name}'")
+        return True
+    
+    def run_expiry_check(self, planner, dry_run, digest, incremental, workers, parameters, shard_spec=None):
+        """Process one run and record it in the ledger"""
+        # Incremental mode continues from the last successful run that covered this window
+        previous_run = self.last_covering_run(planner, shard_spec) if incremental else None
+        if previous_run:
+            planner.changed_since = previous_run.started_at
+            planner.last_run_date = previous_run.run_date
+            self.stdout.write(f"Incremental mode: continuing from run started {previous_run.started_at:%Y-%m-%d %H:%M}")
+        elif incremental:
+            self.stdout.write("Incremental mode: no previous successful run with these channels, scanning everything")
+        
+        # Dry runs are not recorded so they never become a watermark
+        run = None
+        if not dry_run:
+            run = ExpiryRun.objects.create(
+                run_date=planner.today,
+                days_ahead=planner.days_ahead,
+                incremental=planner.incremental,
+                watermark=planner.changed_since,
+                parameters=parameters,
+            )
+        
+        try:
+            if workers > 1:
+                summary = self.process_sharded(planner, workers, dry_run, digest)
             else:
-                self.stdout.write(
-                    self.style.SUCCESS(f"Successfully sent {notifications_sent} expiry notifications.")
-                )
-                
+                summary = self.process_expiry_notifications(planner, dry_run, digest)
         except Exception as e:
+            if run:
+                run.fail(e)
             raise CommandError(f"Command failed: {str(e)}")
-    
-    @transaction.atomic
-    def process_expiry_notifications(self, days_ahead, dry_run, force):
-        """Main logic for processing expiry notifications"""
         
-        # Use the custom manager method
-        expiring_donations = Donation.objects.expiring_within(days=days_ahead)
-        
-        self.stdout.write(f"Found {expiring_donations.count()} donations expiring within {days_ahead} days")
-        
-        if not expiring_donations.exists():
-            self.stdout.write("No expiring donations found.")
-            return 0
-        
-        notifications_sent = 0
-        email_batch = []  # For batch email sending
-        
-        for donation in expiring_donations:
-            days_until_expiry = donation.days_until_expiry
-            
-            # Skip if already expired (safety check)
-            if days_until_expiry < 0:
-                continue
-            
-            recipients = self.get_notification_recipients(donation)
-            
-            for recipient_email in recipients:
-                should_send = force or not self.alert_already_sent(
-                    donation, days_until_expiry, recipient_email
+        if run:
+            run.finish(**summary)
+        self.summary = summary
+        self.write_output_summary()
+        
+        if dry_run:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Dry run completed. Would have sent {summary['alerts_planned']} notifications."
                 )
-                
-                if not should_send:
-                    self.stdout.write(
-                        f"  Skipping {donation.name} for {recipient_email} - already notified"
-                    )
-                    continue
-                
-                if dry_run:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"  [DRY RUN] Would send {donation.urgency_level.upper()} alert for "
-                            f"'{donation.name}' (expires in {days_until_expiry} days) to {recipient_email}"
-                        )
-                    )
-                    notifications_sent += 1
-                else:
-                    # Prepare email for batch sending
-                    email_data = self.prepare_email(donation, recipient_email, days_until_expiry)
-                    email_batch.append(email_data)
-                    
-                    # Record the alert (with duplicate protection)
-                    ExpiryAlert.objects.get_or_create(
-                        donation=donation,
-                        days_before_expiry=days_until_expiry,
-                        recipient_email=recipient_email,
-                        defaults={'alert_type': 'email'}
-                    )
-                    notifications_sent += 1
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully sent {summary['alerts_planned']} expiry notifications "
+                    f"({summary['emails_sent']} emails, {summary['notifications_created']} in-app)."
+                )
+            )
+    
+    def process_sharded(self, planner, workers, dry_run, digest=False):
+        """Split the donations into `workers` shards and process them in parallel processes"""
+        planner_options = {
+            'days_ahead': planner.days_ahead,
+            'force': planner.force,
+            'channels': planner.channels,
+            'email_levels': planner.email_levels,
+            'batch_size': planner.batch_size,
+            'chunk_size': planner.chunk_size,
+            'policy': planner.policy,
+            'changed_since': planner.changed_since,
+            'last_run_date': planner.last_run_date,
+        }
+        self.stdout.write(f"Processing {workers} shards in parallel")
         
-        # Send emails in batch for better performance
-        if email_batch and not dry_run:
-            self.send_batch_emails(email_batch)
+        # The provider's connection limit is shared by every shard; with more shards
+        # than connections, shards only plan and this process sends everything
+        connection_limit = self.email_concurrency or getattr(settings, 'EMAIL_MAX_CONCURRENCY', 4)
+        shard_concurrency = connection_limit // workers
+        send_in_parent = digest or shard_concurrency < 1
+        
+        # Children must open their own connections instead of sharing the parent's sockets
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker) as pool:
+            futures = [
+                pool.submit(
+                    run_shard, {**planner_options, 'shard': (index, workers)}, dry_run, digest,
+                    self.profiler.enabled, max(shard_concurrency, 1), send_in_parent,
+                )
+                for index in range(workers)
+            ]
+            results = [future.result() for future in futures]
         
-        return notifications_sent
+        summary = merge_summaries(shard_summary for _, shard_summary in results)
+        for _, shard_summary in results:
+            if 'profile' in shard_summary:
+                self.profiler.merge(shard_summary['profile'])
+
+        # Digest shards hand their alerts back so each recipient still gets a single email
+        planned = [item for shard_planned, _ in results for item in shard_planned]
+        if send_in_parent and planned and not dry_run:
+            summary['emails_sent'] = self.send_alerts(planned, digest=digest)
+        return summary
     
-    def get_notification_recipients(self, donation):
-        """Get list of email recipients for a donation"""
-        recipients = set()
+    def process_expiry_notifications(self, planner, dry_run, digest=False):
+        """Main logic for processing expiry notifications"""
+        if digest:
+            # Digests group alerts per recipient, so they need the whole plan at once
+            planned, summary = self.plan_alerts(planner, dry_run)
+            if planned and not dry_run:
+                summary['emails_sent'] = self.send_alerts(planned, digest=True)
+            return summary
         
-        # Add donor email if exists
-        if donation.donor and donation.donor.email:
-            recipients.add(donation.donor.email)
+        summary = {'donations_scanned': 0, 'alerts_planned': 0, 'emails_sent': 0, 'notifications_created': 0}
         
-        # Add admin/staff emails
-        User = get_user_model()
-        admin_users = User.objects.filter(
-            is_staff=True, 
-            email__isnull=False
-        ).exclude(email='').values_list('email', flat=True)
+        def counted(planned):
+            for item in planned:
+                summary['alerts_planned'] += 1
+                yield item
         
-        recipients.update(admin_users)
+        planned = counted(planner.iter_plan())
+        if dry_run:
+            for item in planned:
+                self.write_dry_run_line(item)
+        else:
+            # Alerts are recorded batch by batch just before their emails are rendered
+            summary['emails_sent'] = self.send_batch_emails(
+                self.render_email(item)
+                for item in self.record_as_sent(planner, planned)
+                if item.channel == EMAIL
+            )
         
-        return list(recipients)
+        summary['donations_scanned'] = planner.scanned
+        summary['notifications_created'] = planner.notifications_created
+        self.write_scan_summary(planner, summary['alerts_planned'])
+        return summary
+    
+    def record_as_sent(self, planner, planned):
+        """Record planned alerts in batches, passing each batch on once it is stored"""
+        for batch in chunked(planned, planner.batch_size):
+            planner.record(batch)
+            yield from batch
     
-    def alert_already_sent(self, donation, days_until_expiry, recipient_email):
-        """Check if alert was already sent for this combination"""
-        return ExpiryAlert.objects.filter(
-            donation=donation,
-            days_before_expiry=days_until_expiry,
-            recipient_email=recipient_email
-        ).exists()
+    def plan_alerts(self, planner, dry_run):
+        """Plan the alerts that are still due and record them unless this is a dry run"""
+        
+        planned = planner.plan()
+        summary = {
+            'donations_scanned': planner.scanned,
+            'alerts_planned': len(planned),
+            'emails_sent': 0,
+            'notifications_created': 0,
+        }
+        self.write_scan_summary(planner, len(planned))
+        
+        if dry_run:
+            for item in planned:
+                self.write_dry_run_line(item)
+        elif planned:
+            # Record alerts in short batched inserts (duplicate-safe)
+            planner.record(planned)
+            summary['notifications_created'] = planner.notifications_created
+        return planned, summary
+    
+    def write_scan_summary(self, planner, alerts_planned):
+        shard_label = f" (shard {planner.shard[0]}/{planner.shard[1]})" if planner.shard else ""
+        self.stdout.write(
+            f"Scanned {planner.scanned} donations{shard_label}, planned {alerts_planned} alerts "
+            f"for donations expiring within {planner.days_ahead} days"
+        )
+        if not alerts_planned:
+            self.stdout.write("No new expiry alerts to send.")
+    
+    def write_dry_run_line(self, item):
+        """Count a dry-run alert; per-item lines only at --verbosity 2 or more"""
+        self.dry_run_counts[(item.donation.urgency_level, item.channel)] += 1
+        if self.verbosity >= 2:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"  [DRY RUN] Would send {item.donation.urgency_level.upper()} {item.channel} alert for "
+                    f"'{item.donation.name}' (expires in {item.days_until_expiry} days) to {item.recipient_email}"
+                )
+            )
+    
+    def write_output_summary(self):
+        """One aggregated line per kind of output instead of a line per item"""
+        if self.dry_run_counts:
+            breakdown = ", ".join(
+                f"{urgency.upper()} {channel}: {count}"
+                for (urgency, channel), count in sorted(self.dry_run_counts.items())
+            )
+            self.stdout.write(self.style.WARNING(f"  [DRY RUN] Would send {breakdown}"))
+        send_stats = self.send_stats
+        # The counters exist (at 0) on every run; only runs that sent a batch get a line
+        if send_stats['batches']:
+            self.stdout.write(
+                f"  Sent {send_stats['sent']} emails in {send_stats['batches']} batches "
+                f"over {send_stats['connections']} connections"
+                + (f", {send_stats['retried']} retried" if send_stats['retried'] else "")
+                + (f", {send_stats['failed']} failed" if send_stats['failed'] else "")
+            )
+    
+    def render_email(self, item):
+        with self.profiler.phase('email_rendering'):
+            return self.prepare_email(item.donation, item.recipient_email, item.days_until_expiry)
+    
+    def send_alerts(self, planned, digest=False):
+        """Render and send emails for planned alerts, returning the number sent"""
+        planned = [item for item in planned if item.channel == EMAIL]
+        if digest:
+            with self.profiler.phase('email_rendering'):
+                email_batch = [
+                    self.prepare_digest_email(recipient_email, items)
+                    for recipient_email, items in group_by_recipient(planned).items()
+                ]
+        else:
+            email_batch = [self.render_email(item) for item in planned]
+        
+        # Send emails in batch for better performance
+        return self.send_batch_emails(email_batch)
     
     def prepare_email(self, donation, recipient_email, days_until_expiry):
         """Prepare email data for batch sending"""
@@ -195,6 +591,62 @@ Thank you for helping reduce medicine waste and supporting community health!
 Best regards,
 HealthBridge Team
 
+---
+This is an automated message. If you received this in error, please contact support.
+        """.strip()
+        
+        return (
+            subject,
+            message,
+            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@healthbridge.com'),
+            [recipient_email]
+        )
+    
+    def prepare_digest_email(self, recipient_email, items):
+        """Prepare one email listing every expiring medicine for a recipient"""
+        most_urgent = items[0].donation.urgency_level
+        
+        subject = (
+            f"{'🚨 URGENT' if most_urgent in ['critical', 'high'] else '⚠️'} "
+            f"Medicine Expiry Digest: {len(items)} medicine{'s' if len(items) != 1 else ''} expiring soon"
+        )
+        
+        lines = []
+        for item in items:
+            donation = item.donation
+            if item.days_until_expiry == 0:
+                expires = "expires TODAY"
+            elif item.days_until_expiry == 1:
+                expires = "expires TOMORROW"
+            else:
+                expires = f"expires in {item.days_until_expiry} days"
+            lines.append(
+                f"• [{donation.urgency_level.upper()}] {donation.name} x{donation.quantity} - {expires} "
+                f"({donation.expiry_date.strftime('%B %d, %Y')}) | {donation.get_status_display()} | "
+                f"Tracking Code: {donation.tracking_code}"
+            )
+        medicine_list = "\n".join(lines)
+        
+        message = f"""
+Dear HealthBridge User,
+
+The following medicines are approaching their expiry date, most urgent first:
+
+{medicine_list}
+
+🎯 Recommended Actions:
+1. Use the medicine if it's for your own needs
+2. Find someone who can use it before expiry
+3. Update the status if it's no longer available
+4. Contact us if you need assistance
+
+💡 To prevent waste and help others, please update the medicine status in our system if it's no longer available.
+
+Thank you for helping reduce medicine waste and supporting community health!
+
+Best regards,
+HealthBridge Team
+
 ---
 This is an automated message. If you received this in error, please contact support.
         """.strip()
@@ -207,20 +659,30 @@ This is an automated message. If you received this in error, please contact supp
         )
     
     def send_batch_emails(self, email_batch):
-        """Send emails in batch for better performance"""
-        try:
-            send_mass_mail(email_batch, fail_silently=False)
-            self.stdout.write(f"  ✓ Sent batch of {len(email_batch)} emails")
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"  ✗ Batch email error: {str(e)}"))
-            
-            # Fallback: send emails individually
-            self.stdout.write("  Attempting individual email sending...")
-            for subject, message, from_email, recipient_list in email_batch:
-                try:
-                    send_mail(subject, message, from_email, recipient_list, fail_silently=False)
-                    self.stdout.write(f"    ✓ Sent individual email to {recipient_list[0]}")
-                except Exception as individual_error:
-                    self.stdout.write(
-                        self.style.ERROR(f"    ✗ Failed to send to {recipient_list[0]}: {individual_error}")
-                    )
\ No newline at end of file
+        """
+        Send emails through the pooled dispatcher, returning how many were sent.
+        `email_batch` may be a generator; it is consumed one chunk at a time.
+        """
+        dispatcher = MailDispatcher(
+            concurrency=self.email_concurrency,
+            chunk_size=self.email_chunk_size,
+            on_chunk=self.record_email_chunk,
+        )
+        with self.profiler.phase('smtp_send'):
+            sent = dispatcher.send(email_batch)
+        
+        for message, error in dispatcher.failures:
+            self.stdout.write(self.style.ERROR(f"  ✗ Failed to send to {', '.join(message.to)}: {error}"))
+        self.send_stats['retried'] += dispatcher.stats['retried']
+        self.send_stats['connections'] += dispatcher.stats['connections']
+        self.email_latencies.extend(dispatcher.latencies)
+        return sent
+    
+    def record_email_chunk(self, messages, sent, seconds):
+        """Per-chunk bookkeeping, called by the dispatcher's worker threads"""
+        self.profiler.record_smtp(messages, seconds, ok=sent == messages)
+        self.send_stats['batches'] += 1
+        self.send_stats['sent'] += sent
+        self.send_stats['failed'] += messages - sent
+        if self.verbosity >= 2:
+            self.stdout.write(f"  ✓ Sent batch of {sent}/{messages} emails in {seconds:.2f}s")
@@ -0,0 +1,24 @@
+"""
+Management command to rebuild the per-day expiry calendar from the donations table.
+Usage: python manage.py rebuild_expiry_calendar
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from donations.models import ExpiryCalendar
+
+
+class Command(BaseCommand):
+    help = 'Recompute the expiry calendar (live donations and units per expiry day) from scratch'
+
+    def handle(self, *args, **options):
+        days = ExpiryCalendar.objects.rebuild()
+        totals = ExpiryCalendar.objects.aggregate(donations=Sum('donations'), units=Sum('units'))
+        self.summary = {'days': days, 'donations': totals['donations'] or 0, 'units': totals['units'] or 0}
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt expiry calendar: {days} days, "
+                f"{self.summary['donations']} live donations, {self.summary['units']} units."
+            )
+        )
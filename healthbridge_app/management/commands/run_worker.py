@@ -0,0 +1,72 @@
+"""
+Management command to process background jobs from the database queue.
+Usage: python manage.py run_worker [--once] [--batch-size 10] [--idle-sleep 2]
+"""
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from healthbridge_app import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs queued in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are due now and exit'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Number of jobs to claim at a time (default: 10)'
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty (default: 2)'
+        )
+        parser.add_argument(
+            '--worker-id',
+            type=str,
+            default=None,
+            help='Name recorded on claimed jobs (default: hostname:pid)'
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or f"{socket.gethostname()}:{os.getpid()}"
+        batch_size = options['batch_size']
+        self.stopping = False
+
+        # Finish the current job, then exit on SIGTERM/SIGINT
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        self.stdout.write(f"Worker {worker_id} started")
+
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            jobs.requeue_stale_jobs()
+
+            count = jobs.work(worker_id, batch_size=batch_size)
+            processed += count
+
+            if options['once'] and count < batch_size:
+                break
+            if count == 0:
+                time.sleep(options['idle_sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker_id} stopped after {processed} jobs"))
+
+    def request_stop(self, signum, frame):
+        self.stdout.write("Stop requested, finishing current batch...")
+        self.stopping = True
@@ -0,0 +1,32 @@
+"""
+Management command to retire expired donations from the live inventory.
+Usage: python manage.py sweep_expired [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+
+from healthbridge_app.services.expiry_sweep import sweep_expired_donations
+
+
+class Command(BaseCommand):
+    help = 'Mark expired donations as expired, release open requests matched to them and notify donors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many donations would be swept without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        summary = sweep_expired_donations(dry_run=dry_run)
+        self.summary = summary
+
+        prefix = "[DRY RUN] Would sweep" if dry_run else "Swept"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix} {summary['donations_expired']} expired donations, "
+                f"released {summary['requests_released']} open requests, "
+                f"notified {summary['donors_notified']} donors."
+            )
+        )
@@ -0,0 +1,475 @@
+"""
+Shared, memory-mapped medicine name catalog for HealthBridge
+`manage.py build_medicine_catalog` compiles every donation, generic and
+brand medicine name into one read-only binary file. Web workers mmap it,
+so all processes on a host share a single page-cached copy instead of
+each building its own index. A rebuild writes a new file and swaps it in
+with os.replace; readers notice the new inode and remap.
+
+The file lives on each web host's own disk. It is first built during the
+deploy build; after that, names saved since are served from the
+in-process index (autocomplete_index.py). Once there are any, or a name was
+renamed or deleted since (MedicineCatalogState), and the file is older than
+MEDICINE_CATALOG_REBUILD_DELAY, one web worker per host recompiles it in
+the background (CatalogFile.rebuild_if_due).
+
+    catalog = get_medicine_catalog()   # None if no file has been built
+    catalog.lookup('parac', limit=10)
+    catalog.related('Biogesic')        # ['Paracetamol']
+
+File layout (little-endian; every section starts on a 4-byte boundary):
+
+    header          magic, version, counts, section offsets, build time, the
+                    highest primary key read from each of SOURCES and the
+                    MedicineCatalogState.name_changes counter (HEADER)
+    kinds           u8 per name: DONATION | GENERIC | BRAND
+    key offsets     u32 x (names + 1), into the key strings
+    key strings     normalized names, UTF-8, sorted bytewise
+    display offsets u32 x (names + 1), into the display strings
+    display strings names as shown to users, UTF-8
+    suffixes        (name, byte offset) u32 pairs, one per word start,
+                    sorted by the key text from that offset on
+    edges           (generic, brand) u32 pairs, sorted
+    reverse edges   (brand, generic) u32 pairs, sorted
+"""
+import hashlib
+import logging
+import mmap
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from .autocomplete_index import MAX_CANDIDATES, SOURCES, normalize, word_suffixes
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'HBMEDCAT'
+FORMAT_VERSION = 3
+# magic, format version, catalog version, names, suffixes, edges, 8 section offsets,
+# build time (epoch seconds), the highest primary key read from each of SOURCES,
+# then the name change counter
+HEADER = struct.Struct('<8sI16sIII8Id3QQ')
+
+DONATION, GENERIC, BRAND = 1, 2, 4
+
+
+class CatalogFormatError(ValueError):
+    """Raised when a catalog file is truncated, from another format version or not a catalog at all"""
+
+
+# ---------- Compiling ----------
+
+def collect_names() -> Tuple[Dict[str, List], Set[Tuple[str, str]], List[int], int]:
+    """
+    Every medicine name as {key: [display name, kinds]}, (generic key, brand key)
+    edges, the highest primary key of each of SOURCES and the name change
+    counter when reading began. Catalogue spellings win over free-text donation names.
+    """
+    from django.apps import apps
+    from django.db.models import Max
+    from donations.models import Donation
+    from .models import BrandMedicine, GenericMedicine, MedicineCatalogState
+
+    # Taken first, so rows saved while reading are above the watermark (and may be read twice, never missed)
+    name_changes = MedicineCatalogState.current()
+    watermarks = [apps.get_model(label).objects.aggregate(top=Max('pk'))['top'] or 0 for label, _ in SOURCES]
+    names: Dict[str, List] = {}
+    edges: Set[Tuple[str, str]] = set()
+
+    def add(name, kind):
+        key = normalize(name)
+        if key:
+            names.setdefault(key, [' '.join(name.split()), 0])[1] |= kind
+        return key
+
+    for name in GenericMedicine.objects.values_list('name', flat=True).iterator():
+        add(name, GENERIC)
+    for brand_name, generic_name in BrandMedicine.objects.values_list('brand_name', 'generic__name').iterator():
+        brand, generic = add(brand_name, BRAND), add(generic_name, GENERIC)
+        if brand and generic:
+            edges.add((generic, brand))
+    for name in Donation.objects.values_list('name', flat=True).distinct().order_by().iterator():
+        add(name, DONATION)
+    return names, edges, watermarks, name_changes
+
+
+def _align(buffer: bytearray):
+    buffer.extend(b'\0' * (-len(buffer) % 4))
+
+
+def _string_table(strings: List[bytes]) -> Tuple[array, bytes]:
+    offsets = array('I', [0])
+    for value in strings:
+        offsets.append(offsets[-1] + len(value))
+    return offsets, b''.join(strings)
+
+
+def encode_catalog(
+    names: Dict[str, List],
+    edges: Set[Tuple[str, str]],
+    watermarks: Optional[List[int]] = None,
+    built_at: Optional[float] = None,
+    name_changes: int = 0,
+) -> bytes:
+    """The catalog file contents for collect_names() output"""
+    if array('I').itemsize != 4 or sys.byteorder != 'little':
+        raise RuntimeError("The medicine catalog format needs 4-byte little-endian unsigned ints")
+
+    keys = sorted(names, key=lambda key: key.encode('utf-8'))
+    encoded = [key.encode('utf-8') for key in keys]
+    position = {key: i for i, key in enumerate(keys)}
+
+    suffixes = []
+    for i, (key, value) in enumerate(zip(keys, encoded)):
+        for suffix in word_suffixes(key):
+            offset = len(value) - len(suffix.encode('utf-8'))
+            suffixes.append((value[offset:], i, offset))
+    suffixes.sort()
+    suffix_pairs = array('I')
+    for _, i, offset in suffixes:
+        suffix_pairs.extend((i, offset))
+
+    edge_pairs = sorted((position[generic], position[brand]) for generic, brand in edges)
+    forward, reverse = array('I'), array('I')
+    for generic, brand in edge_pairs:
+        forward.extend((generic, brand))
+    for brand, generic in sorted((brand, generic) for generic, brand in edge_pairs):
+        reverse.extend((brand, generic))
+
+    key_offsets, key_blob = _string_table(encoded)
+    display_offsets, display_blob = _string_table([names[key][0].encode('utf-8') for key in keys])
+
+    body = bytearray()
+    offsets = []
+    for section in (
+        bytes(names[key][1] for key in keys),
+        key_offsets.tobytes(), key_blob,
+        display_offsets.tobytes(), display_blob,
+        suffix_pairs.tobytes(), forward.tobytes(), reverse.tobytes(),
+    ):
+        _align(body)
+        offsets.append(HEADER.size + len(body))
+        body.extend(section)
+
+    watermarks = list(watermarks or [0] * len(SOURCES))
+    # The watermarks and change counter are part of the version, so any new, renamed or
+    # deleted row produces a new file even if the set of names came out the same
+    stamps = array('Q', watermarks + [name_changes]).tobytes()
+    version = hashlib.sha256(body + stamps).hexdigest()[:16].encode('ascii')
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, version, len(keys), len(suffixes), len(edge_pairs), *offsets,
+        time.time() if built_at is None else built_at, *watermarks, name_changes,
+    )
+    return header + bytes(body)
+
+
+def catalog_path() -> str:
+    return getattr(settings, 'MEDICINE_CATALOG_PATH', '')
+
+
+def read_header(path: str) -> Optional[Tuple]:
+    """HEADER fields of the catalog at `path`, or None if there is no readable catalog"""
+    try:
+        with open(path, 'rb') as catalog_file:
+            fields = HEADER.unpack(catalog_file.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    if fields[0] != MAGIC or fields[1] != FORMAT_VERSION:
+        return None
+    return fields
+
+
+def read_version(path: str) -> Optional[str]:
+    """Version of the catalog at `path`, or None if there is no readable catalog"""
+    fields = read_header(path)
+    return fields[2].decode('ascii') if fields else None
+
+
+def compile_catalog(path: Optional[str] = None, force: bool = False) -> Dict:
+    """
+    Build the catalog from the database and atomically replace the file at
+    `path`. The file is left alone if its version (a content hash) is unchanged.
+    """
+    path = path or catalog_path()
+    if not path:
+        raise ValueError("MEDICINE_CATALOG_PATH is not set")
+    started = time.perf_counter()
+    built_at = time.time()
+    names, edges, watermarks, name_changes = collect_names()
+    data = encode_catalog(names, edges, watermarks, built_at, name_changes)
+    version = HEADER.unpack_from(data)[2].decode('ascii')
+    result = {'path': path, 'version': version, 'names': len(names), 'edges': len(edges), 'bytes': len(data)}
+
+    if not force and read_version(path) == version:
+        result['changed'] = False
+        return result
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # Written beside the target so os.replace is an atomic rename on the same filesystem
+    fd, tmp_path = tempfile.mkstemp(prefix='.medicine-catalog-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    result['changed'] = True
+    result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(
+        f"Medicine catalog {version}: {result['names']} names, {result['edges']} brand links, "
+        f"{result['bytes']} bytes in {result['duration_ms']}ms"
+    )
+    return result
+
+
+# ---------- Reading ----------
+
+class _SuffixView:
+    """Sequence of suffix strings (bytes) in file order, for bisect"""
+
+    def __init__(self, catalog: 'MedicineCatalog'):
+        self.catalog = catalog
+
+    def __len__(self):
+        return self.catalog.suffix_count
+
+    def __getitem__(self, j):
+        name, offset = self.catalog._suffixes[2 * j], self.catalog._suffixes[2 * j + 1]
+        return self.catalog.key(name)[offset:]
+
+
+class _KeyView:
+    """Sequence of name keys (bytes), for bisect"""
+
+    def __init__(self, catalog: 'MedicineCatalog'):
+        self.catalog = catalog
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def __getitem__(self, i):
+        return self.catalog.key(i)
+
+
+class _PairColumn:
+    """First column of a flat u32 pair array, for bisect"""
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+    def __len__(self):
+        return len(self.pairs) // 2
+
+    def __getitem__(self, j):
+        return self.pairs[2 * j]
+
+
+class MedicineCatalog:
+    """
+    Read-only view of a compiled catalog file. Nothing is copied out of the
+    mapping up front, so opening it costs the same however large it is.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as catalog_file:
+            self._mmap = mmap.mmap(catalog_file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        try:
+            fields = HEADER.unpack_from(view)
+        except struct.error:
+            raise CatalogFormatError(f"{path} is too short to be a medicine catalog")
+        magic, format_version, version, names, suffixes, edges = fields[:6]
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise CatalogFormatError(f"{path} is not a version {FORMAT_VERSION} medicine catalog")
+        kinds, key_offsets, keys, display_offsets, displays, suffix_pairs, forward, reverse = fields[6:14]
+
+        self.version = version.decode('ascii')
+        self.built_at = fields[14]
+        # {source label: highest primary key compiled in}; rows above it are newer than the catalog
+        self.watermarks = {label: top for (label, _), top in zip(SOURCES, fields[15:18])}
+        # Renames and deletions compiled in; a higher MedicineCatalogState count means it is out of date
+        self.name_changes = fields[18]
+        self.name_count, self.suffix_count, self.edge_count = names, suffixes, edges
+        self._kinds = view[kinds:kinds + names]
+        self._key_offsets = view[key_offsets:key_offsets + 4 * (names + 1)].cast('I')
+        self._keys = view[keys:keys + self._key_offsets[names]]
+        self._display_offsets = view[display_offsets:display_offsets + 4 * (names + 1)].cast('I')
+        self._displays = view[displays:displays + self._display_offsets[names]]
+        self._suffixes = view[suffix_pairs:suffix_pairs + 8 * suffixes].cast('I')
+        self._edges = view[forward:forward + 8 * edges].cast('I')
+        self._reverse_edges = view[reverse:reverse + 8 * edges].cast('I')
+        if len(self._displays) != self._display_offsets[names] or len(self._reverse_edges) != 2 * edges:
+            raise CatalogFormatError(f"{path} is truncated")
+
+    def __len__(self):
+        return self.name_count
+
+    def key(self, i: int) -> bytes:
+        return bytes(self._keys[self._key_offsets[i]:self._key_offsets[i + 1]])
+
+    def display(self, i: int) -> str:
+        return str(self._displays[self._display_offsets[i]:self._display_offsets[i + 1]], 'utf-8')
+
+    def kinds(self, i: int) -> int:
+        return self._kinds[i]
+
+    def names(self) -> Iterator[str]:
+        """Every display name, in key order"""
+        return (self.display(i) for i in range(self.name_count))
+
+    def find(self, name: str) -> Optional[int]:
+        """Index of `name` (any spelling that normalizes the same), or None"""
+        key = normalize(name).encode('utf-8')
+        i = bisect_left(_KeyView(self), key)
+        return i if i < self.name_count and self.key(i) == key else None
+
+    def related(self, name: str) -> List[str]:
+        """Brands of a generic name, or the generic(s) of a brand name"""
+        i = self.find(name)
+        if i is None:
+            return []
+        related = []
+        for pairs in (self._edges, self._reverse_edges):
+            j = bisect_left(_PairColumn(pairs), i)
+            while 2 * j < len(pairs) and pairs[2 * j] == i:
+                related.append(self.display(pairs[2 * j + 1]))
+                j += 1
+        return related
+
+    def lookup(self, query: str, limit: int = 10) -> List[str]:
+        """Same matches and order as AutocompleteIndex.lookup"""
+        prefix = normalize(query).encode('utf-8')
+        if not prefix:
+            return []
+        matches = set()
+        j = bisect_left(_SuffixView(self), prefix)
+        while j < self.suffix_count and len(matches) < MAX_CANDIDATES:
+            name, offset = self._suffixes[2 * j], self._suffixes[2 * j + 1]
+            if not self.key(name)[offset:].startswith(prefix):
+                break
+            matches.add(name)
+            j += 1
+        keys = {i: self.key(i) for i in matches}
+        ranked = sorted(matches, key=lambda i: (not keys[i].startswith(prefix), len(keys[i]), keys[i]))
+        return [self.display(i) for i in ranked[:limit]]
+
+
+class CatalogFile:
+    """
+    The catalog at MEDICINE_CATALOG_PATH, remapped when the file is replaced.
+    The path is stat()ed at most every MEDICINE_CATALOG_CHECK_SECONDS; an old
+    mapping stays valid for whoever still holds it and is unmapped once unused.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self.catalog: Optional[MedicineCatalog] = None
+        self._signature = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    @property
+    def path(self) -> str:
+        return self._path or catalog_path()
+
+    def get(self) -> Optional[MedicineCatalog]:
+        interval = getattr(settings, 'MEDICINE_CATALOG_CHECK_SECONDS', 5)
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < interval:
+            return self.catalog
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._reload_if_replaced()
+        return self.catalog
+
+    def _reload_if_replaced(self):
+        path = self.path
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        if stat is None:
+            self.catalog, self._signature = None, None
+            return
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if signature == self._signature:
+            return
+        try:
+            self.catalog = MedicineCatalog(path)
+            self._signature = signature
+            logger.info(f"Mapped medicine catalog {self.catalog.version} ({len(self.catalog)} names) from {path}")
+        except (OSError, ValueError) as e:
+            # Keep serving the previous mapping rather than nothing
+            logger.warning(f"Could not map medicine catalog {path}: {e}")
+
+    def rebuild_if_due(self):
+        """
+        Recompile the catalog on a background thread if it is older than
+        MEDICINE_CATALOG_REBUILD_DELAY. Called when names newer than the
+        catalog exist or names in it were renamed or deleted; a per-host run lock lets one worker on the host do it
+        and the others remap the result.
+        """
+        from .run_lock import RunLock
+
+        catalog, path = self.catalog, self.path
+        delay = getattr(settings, 'MEDICINE_CATALOG_REBUILD_DELAY', 300)
+        if catalog is None or time.time() - catalog.built_at < delay:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def rebuild():
+            from django.db import connection
+            lock = RunLock(f"medicine_catalog:{socket.gethostname()}")
+            try:
+                if not lock.acquire(wait=0):
+                    return
+                try:
+                    fields = read_header(path)
+                    # Another worker on this host may have just replaced it
+                    if fields is None or fields[14] == catalog.built_at:
+                        compile_catalog(path)
+                finally:
+                    lock.release()
+            except Exception as e:
+                logger.warning(f"Medicine catalog rebuild failed: {e}")
+            finally:
+                self._rebuilding = False
+                connection.close()
+
+        threading.Thread(target=rebuild, name='medicine-catalog', daemon=True).start()
+
+
+_catalog_file = CatalogFile()
+
+
+def get_medicine_catalog() -> Optional[MedicineCatalog]:
+    """This host's shared catalog, or None if none has been built"""
+    return _catalog_file.get()
+
+
+def get_catalog_file() -> CatalogFile:
+    """This process's handle on the catalog file"""
+    return _catalog_file
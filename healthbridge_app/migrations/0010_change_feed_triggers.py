@@ -0,0 +1,59 @@
+from django.db import migrations
+
+
+# healthbridge_app_medicinerequest (owned by the requests app, which recreates it after this
+# app's migrations) gets its trigger from requests.0005_change_feed_trigger
+WATCHED_TABLES = ['donations_donation']
+
+TRIGGER_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION healthbridge_notify_change() RETURNS trigger AS $$
+DECLARE
+    row_id bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+    ELSE
+        row_id := NEW.id;
+    END IF;
+    PERFORM pg_notify(
+        'healthbridge_changes',
+        json_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'id', row_id)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def install_triggers(apps, schema_editor):
+    """Publish row changes with NOTIFY (PostgreSQL only; SQLite polls instead)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(TRIGGER_FUNCTION_SQL)
+    for table in WATCHED_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_notify ON {table}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_notify "
+            f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION healthbridge_notify_change()"
+        )
+
+
+def remove_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in WATCHED_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_notify ON {table}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS healthbridge_notify_change()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthbridge_app', '0009_job'),
+        ('donations', '0005_expiryrun'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_triggers, remove_triggers),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthbridge_app', '0010_change_feed_triggers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('donation_approved', 'Donation Approved'), ('donation_rejected', 'Donation Rejected'), ('request_approved', 'Request Approved'), ('request_rejected', 'Request Rejected'), ('request_matched', 'Request Matched'), ('medicine_expiring', 'Medicine Expiring Soon'), ('medicine_expired', 'Medicine Expired'), ('system', 'System Notification')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# Must match healthbridge_app.search_backend.SEARCH_COLUMNS
+SEARCH_COLUMNS = [
+    ('donations_donation', 'name'),
+    ('healthbridge_app_genericmedicine', 'name'),
+    ('healthbridge_app_brandmedicine', 'brand_name'),
+]
+
+
+def install_trigram_indexes(apps, schema_editor):
+    """
+    GIN trigram index on UPPER(col::text), the expression Django's icontains
+    compiles to (PostgreSQL only; on SQLite the FTS5 shadow tables are
+    created after every migrate by healthbridge_app.signals)
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_{column}_trgm "
+            f"ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+        )
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthbridge_app', '0011_notification_medicine_expired'),
+        ('donations', '0008_expirycalendar'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_trigram_indexes, remove_trigram_indexes),
+    ]
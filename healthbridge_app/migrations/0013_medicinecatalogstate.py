@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+def create_state_row(apps, schema_editor):
+    apps.get_model('healthbridge_app', 'MedicineCatalogState').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthbridge_app', '0012_medicine_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicineCatalogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name_changes', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_state_row, migrations.RunPython.noop),
+    ]
@@ -71,6 +71,7 @@ class Notification(models.Model):
         REQUEST_REJECTED = 'request_rejected', 'Request Rejected'
         REQUEST_MATCHED = 'request_matched', 'Request Matched'
         MEDICINE_EXPIRING = 'medicine_expiring', 'Medicine Expiring Soon'
+        MEDICINE_EXPIRED = 'medicine_expired', 'Medicine Expired'
         SYSTEM = 'system', 'System Notification'
     
     user = models.ForeignKey(
@@ -128,6 +129,61 @@ class Notification(models.Model):
             return "Just now"
 
 
+class Job(models.Model):
+    """Background job stored in the main database and processed by `manage.py run_worker`"""
+    
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    
+    # Retry bookkeeping
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the job may run")
+    last_error = models.TextField(blank=True, default="")
+    
+    # Worker claim
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+
+class MedicineCatalogState(models.Model):
+    """
+    Single row counting renamed and deleted medicine names, so each web host
+    can tell that its compiled medicine catalog (medicine_catalog.py) still
+    suggests names that are gone
+    """
+    
+    name_changes = models.PositiveBigIntegerField(default=0)
+    
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(name_changes=models.F('name_changes') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'name_changes': 1})
+    
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list('name_changes', flat=True).first() or 0
+
+
 # ============================================================================
 # NOTE: Donation, ExpiryAlert, and MedicineRequest models have been moved to
 # their respective modular apps (donations and requests modules).
@@ -0,0 +1,234 @@
+"""
+Cross-process run locks for HealthBridge
+On PostgreSQL a session-level advisory lock is held on a dedicated connection,
+so it is released automatically if the holder dies. Elsewhere (SQLite for
+local development) an OS file lock is used, with the holder written into the file.
+"""
+import json
+import logging
+import os
+import socket
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class RunLockHeld(Exception):
+    """Raised when a lock is held by another run"""
+
+    def __init__(self, name: str, holder: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.holder = holder
+        super().__init__(f"Run lock '{name}' is held by {describe_holder(holder)}")
+
+
+def describe_holder(holder: Optional[Dict[str, Any]]) -> str:
+    if not holder:
+        return "another process"
+    return ", ".join(f"{key}={value}" for key, value in holder.items() if value not in (None, ''))
+
+
+class RunLock:
+    """
+    Named lock shared by every process using the same database:
+
+        with RunLock('check_expiry'):
+            ...
+
+    The context manager raises RunLockHeld if the lock is taken; use
+    `acquire(wait=...)` directly to skip or wait instead.
+
+    With shared=True any number of shared holders may hold the lock at once,
+    but never together with an exclusive holder. (Windows lock files have
+    no shared mode, so there shared holders exclude each other too.)
+    """
+
+    def __init__(self, name: str, using: str = 'default', lock_dir: Optional[str] = None, shared: bool = False):
+        self.name = name
+        self.using = using
+        self.shared = shared
+        self.lock_dir = lock_dir or getattr(settings, 'RUN_LOCK_DIR', None) or tempfile.gettempdir()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.acquired_at = None
+        self._connection = None
+        self._file = None
+
+    @property
+    def key(self) -> int:
+        """Advisory lock key derived from the name (fits a signed 32-bit int)"""
+        return zlib.crc32(f"healthbridge:{self.name}".encode()) & 0x7FFFFFFF
+
+    @property
+    def path(self) -> str:
+        safe_name = "".join(ch if ch.isalnum() else '_' for ch in self.name)
+        return os.path.join(self.lock_dir, f"healthbridge-{safe_name}.lock")
+
+    @property
+    def uses_advisory_lock(self) -> bool:
+        return connections[self.using].vendor == 'postgresql'
+
+    @property
+    def locked(self) -> bool:
+        return self.acquired_at is not None
+
+    def acquire(self, wait: Optional[float] = 0, poll_interval: float = 1.0) -> bool:
+        """
+        Try to take the lock. `wait` is how many seconds to keep trying
+        (0 = fail immediately, None = wait forever). Returns True on success.
+        """
+        deadline = None if wait is None else time.monotonic() + wait
+        while True:
+            if self._try_acquire():
+                self.acquired_at = timezone.now()
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval if deadline is None else min(poll_interval, max(deadline - time.monotonic(), 0)))
+
+    def release(self):
+        if not self.locked:
+            return
+        try:
+            if self._connection is not None:
+                unlock = 'pg_advisory_unlock_shared' if self.shared else 'pg_advisory_unlock'
+                with self._connection.cursor() as cursor:
+                    cursor.execute(f"SELECT {unlock}(%s)", [self.key])
+            elif self._file is not None:
+                if not self.shared:
+                    self._file.seek(0)
+                    self._file.truncate()
+                self._unlock_file(self._file)
+        finally:
+            self._close()
+            self.acquired_at = None
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        """Who holds the lock right now, for diagnostics (None if free or unknown)"""
+        if self.uses_advisory_lock:
+            return self._advisory_holder()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as lock_file:
+                return json.loads(lock_file.read() or 'null')
+        except (OSError, ValueError):
+            return None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RunLockHeld(self.name, self.holder())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    # ---------- PostgreSQL ----------
+
+    def _try_acquire(self) -> bool:
+        if self.uses_advisory_lock:
+            return self._try_advisory_lock()
+        return self._try_file_lock()
+
+    def _try_advisory_lock(self) -> bool:
+        # A dedicated connection keeps the lock independent of the ORM
+        # connection, which may be closed or reset while the run is going
+        if self._connection is None:
+            self._connection = connections.create_connection(self.using)
+            with self._connection.cursor() as cursor:
+                cursor.execute("SELECT set_config('application_name', %s, false)", [
+                    f"healthbridge:{self.name} {self.owner}"[:63]
+                ])
+        try_lock = 'pg_try_advisory_lock_shared' if self.shared else 'pg_try_advisory_lock'
+        with self._connection.cursor() as cursor:
+            cursor.execute(f"SELECT {try_lock}(%s)", [self.key])
+            acquired = cursor.fetchone()[0]
+        if not acquired:
+            self._close()
+        return acquired
+
+    def _advisory_holder(self) -> Optional[Dict[str, Any]]:
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT a.pid, a.application_name, host(a.client_addr), a.backend_start, a.state
+                FROM pg_locks l
+                JOIN pg_stat_activity a ON a.pid = l.pid
+                WHERE l.locktype = 'advisory' AND l.granted
+                  AND l.classid = 0 AND l.objid = %s AND l.objsubid = 1
+                """,
+                [self.key],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        pid, application_name, client_addr, backend_start, state = row
+        return {
+            'pid': pid,
+            'application': application_name,
+            'client_addr': client_addr,
+            'since': backend_start.isoformat() if backend_start else None,
+            'state': state,
+        }
+
+    # ---------- Lock file ----------
+
+    def _try_file_lock(self) -> bool:
+        os.makedirs(self.lock_dir, exist_ok=True)
+        lock_file = open(self.path, 'a+', encoding='utf-8')
+        try:
+            self._lock_file(lock_file, self.shared)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._file = lock_file
+        if self.shared:
+            # Other shared holders may be reading or holding the file; only an exclusive holder records itself
+            return True
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(json.dumps({
+            'owner': self.owner,
+            'name': self.name,
+            'since': timezone.now().isoformat(timespec='seconds'),
+        }))
+        lock_file.flush()
+        return True
+
+    @staticmethod
+    def _lock_file(lock_file, shared=False):
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+
+    @staticmethod
+    def _unlock_file(lock_file):
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception as e:
+                logger.warning(f"Closing run lock connection for '{self.name}' failed: {e}")
+            self._connection = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,188 @@
+"""
+Indexed medicine name search for HealthBridge
+`name__icontains` compiles to a leading-wildcard LIKE that no B-tree index can
+serve. On PostgreSQL the searched columns carry pg_trgm GIN indexes and results
+are ranked by trigram similarity; on SQLite an FTS5 trigram shadow table per
+column (kept in sync by triggers) answers the substring match. Both sit behind
+the same API:
+
+    search = get_search_backend()
+    donations = search.filter(Donation.objects.all(), 'name', query)
+    names = search.suggest(query)
+"""
+from typing import List, Tuple
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+
+# (table, column) pairs that get a trigram index (migration 0012_medicine_search_indexes)
+# or, on SQLite, an FTS5 shadow table (ensure_sqlite_fts, run after every migrate)
+SEARCH_COLUMNS: List[Tuple[str, str]] = [
+    ('donations_donation', 'name'),
+    ('healthbridge_app_genericmedicine', 'name'),
+    ('healthbridge_app_brandmedicine', 'brand_name'),
+]
+
+# FTS5's trigram tokenizer can only match queries of at least three characters
+FTS_MIN_QUERY = 3
+
+
+def fts_table_name(table: str, column: str) -> str:
+    return f"{table}_{column}_fts"
+
+
+def sqlite_fts_sql(table: str, column: str) -> List[str]:
+    """External-content FTS5 trigram table over one column plus the triggers that keep it current"""
+    fts = fts_table_name(table, column)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def ensure_sqlite_fts(connection) -> bool:
+    """
+    Create any missing FTS5 tables/triggers and reindex those columns.
+    Runs after every migrate: SQLite table rebuilds (AlterField) drop triggers.
+    Returns False if this SQLite build has no FTS5 trigram tokenizer (3.34+).
+    """
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.healthbridge_fts_probe USING fts5(x, tokenize='trigram')")
+            cursor.execute("DROP TABLE temp.healthbridge_fts_probe")
+        except Exception:
+            return False
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for table, column in SEARCH_COLUMNS:
+            fts = fts_table_name(table, column)
+            wanted = {fts, f"{fts}_ai", f"{fts}_ad", f"{fts}_au"}
+            if table not in existing or wanted <= existing:
+                continue
+            for sql in sqlite_fts_sql(table, column):
+                cursor.execute(sql)
+            # Rows may have changed while a trigger was missing
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    return True
+
+
+class SearchBackend:
+    """
+    Fallback used when no index is available: substring match, with names
+    that start with the query first and shorter (closer) names before longer ones.
+    """
+
+    def __init__(self, using: str = 'default'):
+        self.using = using
+
+    def prefix_rank(self, field: str, query: str) -> Case:
+        return Case(
+            When(**{f'{field}__istartswith': query}, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    def match(self, queryset, field: str, query: str):
+        return queryset.filter(**{f'{field}__icontains': query})
+
+    def rank(self, queryset, field: str, query: str):
+        return queryset.annotate(search_prefix=self.prefix_rank(field, query)).order_by(
+            '-search_prefix', Length(field), field,
+        )
+
+    def filter(self, queryset, field: str, query: str):
+        """Rows whose `field` contains `query`, best matches first"""
+        query = query.strip()
+        if not query:
+            return queryset
+        return self.rank(self.match(queryset, field, query), field, query)
+
+    def names(self, queryset, field: str, query: str, limit: int = 10) -> List[str]:
+        """Distinct matching values of `field`, best first"""
+        rows = self.filter(queryset, field, query).values_list(field, flat=True).distinct()
+        return list(rows[:limit])
+
+    def suggest(self, query: str, limit: int = 10) -> List[str]:
+        """Medicine names for autocomplete, from donations and the generic catalogue"""
+        from donations.models import Donation
+        from .models import GenericMedicine
+
+        query = query.strip()
+        if not query:
+            return []
+        candidates = (
+            self.names(Donation.objects.all(), 'name', query, limit)
+            + self.names(GenericMedicine.objects.all(), 'name', query, limit)
+        )
+        # Same ordering as the SQL ranking, applied across both sources
+        lowered = query.lower()
+        unique = {}
+        for name in candidates:
+            unique.setdefault(name.lower(), name)
+        return sorted(
+            unique.values(),
+            key=lambda name: (not name.lower().startswith(lowered), len(name), name.lower()),
+        )[:limit]
+
+
+class TrigramSearchBackend(SearchBackend):
+    """PostgreSQL: icontains is served by the UPPER(col) gin_trgm_ops index, ranked by word similarity"""
+
+    def rank(self, queryset, field: str, query: str):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        return queryset.annotate(
+            search_rank=TrigramWordSimilarity(query, field),
+            search_prefix=self.prefix_rank(field, query),
+        ).order_by('-search_rank', '-search_prefix', Length(field), field)
+
+
+class FTS5SearchBackend(SearchBackend):
+    """SQLite: substring match through the FTS5 trigram shadow table of the searched column"""
+
+    def match(self, queryset, field: str, query: str):
+        column = queryset.model._meta.get_field(field).column
+        table = queryset.model._meta.db_table
+        if len(query) < FTS_MIN_QUERY or (table, column) not in SEARCH_COLUMNS:
+            return super().match(queryset, field, query)
+        fts = fts_table_name(table, column)
+        # Quoted as one FTS5 string so operators and punctuation in the query are literal
+        phrase = '"' + query.replace('"', '""') + '"'
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM "{fts}" WHERE "{fts}" MATCH %s', [phrase]))
+
+
+_backends = {}
+
+
+def get_search_backend(using: str = 'default') -> SearchBackend:
+    """Backend for the connection's database, chosen once per process"""
+    backend = _backends.get(using)
+    if backend is None:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            backend = TrigramSearchBackend(using)
+        elif connection.vendor == 'sqlite' and _fts_installed(connection):
+            backend = FTS5SearchBackend(using)
+        else:
+            backend = SearchBackend(using)
+        _backends[using] = backend
+    return backend
+
+
+def _fts_installed(connection) -> bool:
+    """Every shadow table and its insert trigger exist (otherwise results could be stale)"""
+    names = [fts_table_name(table, column) for table, column in SEARCH_COLUMNS]
+    wanted = set(names) | {f"{name}_ai" for name in names}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        return wanted <= {row[0] for row in cursor.fetchall()}
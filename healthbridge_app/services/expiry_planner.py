@@ -0,0 +1,337 @@
+"""
+Set-based expiry alert planning for HealthBridge
+Resolves recipients, dedupes and records alerts in a constant number of queries,
+streaming donations so memory stays flat however many are expiring
+"""
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from itertools import groupby, islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Mod
+
+from donations.models import Donation, ExpiryAlert, urgency_level_for
+from healthbridge_app.models import Notification
+from .run_profiler import NULL_PROFILER
+
+
+URGENCY_ORDER = ['expired', 'critical', 'high', 'medium', 'low', 'normal']
+
+DEFAULT_ALERT_MILESTONES = [10, 7, 3, 1, 0]
+
+# Alert channels, stored as ExpiryAlert.alert_type
+EMAIL = 'email'
+DASHBOARD = 'dashboard'
+CHANNELS = [EMAIL, DASHBOARD]
+
+
+class DonationRow(NamedTuple):
+    """The columns of a donation the expiry pipeline needs, without a model instance"""
+    id: int
+    name: str
+    quantity: int
+    expiry_date: date
+    status: str
+    tracking_code: str
+    donor_id: Optional[int]
+    donor_email: Optional[str]
+
+    # Column order matches the fields above
+    FIELDS = ('id', 'name', 'quantity', 'expiry_date', 'status', 'tracking_code', 'donor_id', 'donor__email')
+
+    @property
+    def days_until_expiry(self) -> int:
+        return (self.expiry_date - date.today()).days
+
+    @property
+    def urgency_level(self) -> str:
+        return urgency_level_for(self.days_until_expiry)
+
+    def get_status_display(self) -> str:
+        return Donation.Status(self.status).label
+
+
+class PlannedAlert(NamedTuple):
+    """A single (donation, recipient) alert that still has to go out"""
+    donation: DonationRow
+    recipient_email: str
+    days_until_expiry: int
+    milestone: int
+    channel: str = EMAIL
+
+
+class MilestonePolicy:
+    """
+    Decides which alert milestone a donation is in.
+
+    A donation with N days left has crossed every milestone >= N; it is
+    alerted once for the smallest of those. A missed run therefore
+    produces a single alert for the current milestone instead of one per
+    skipped day.
+    """
+
+    def __init__(self, milestones: Iterable[int]):
+        self.milestones = sorted(set(int(m) for m in milestones))
+        if not self.milestones or self.milestones[0] < 0:
+            raise ValueError("Alert milestones must be non-negative day counts")
+
+    @classmethod
+    def from_settings(cls) -> 'MilestonePolicy':
+        return cls(getattr(settings, 'EXPIRY_ALERT_MILESTONES', DEFAULT_ALERT_MILESTONES))
+
+    @classmethod
+    def parse(cls, value: str) -> 'MilestonePolicy':
+        """Build a policy from a comma-separated list such as '10,7,3,1,0'"""
+        return cls(int(part) for part in value.split(',') if part.strip())
+
+    def milestone_for(self, days_until_expiry: int) -> Optional[int]:
+        """Current milestone for a day count, or None if outside every milestone"""
+        index = bisect_left(self.milestones, days_until_expiry)
+        if index == len(self.milestones):
+            return None
+        return self.milestones[index]
+
+
+class ExpiryAlertPlanner:
+    """
+    Plans expiry alerts for every expiring donation in one pass.
+
+    Query budget per run, independent of inventory size:
+    1. staff recipient emails
+    2. expiring donations (donor email joined in), streamed in id order
+    3. already-sent alerts for those donations, streamed in the same order
+    4. batched inserts of the new alerts
+
+    Donations and sent alerts are read through cursors in `chunk_size`
+    rows and merge-joined on donation id, so only one donation's alerts
+    are held in memory at a time.
+    """
+
+    def __init__(self, days_ahead: int = 10, force: bool = False,
+                 channels: Iterable[str] = (EMAIL,),
+                 email_levels: Optional[Iterable[str]] = None,
+                 batch_size: int = 500,
+                 chunk_size: int = 2000,
+                 policy: Optional[MilestonePolicy] = None,
+                 changed_since: Optional[datetime] = None,
+                 last_run_date: Optional[date] = None,
+                 donation_ids: Optional[Iterable[int]] = None,
+                 shard: Optional[Tuple[int, int]] = None,
+                 profiler=None):
+        self.days_ahead = days_ahead
+        self.force = force
+        # Donors get dashboard notifications for every milestone; email can be
+        # limited to some urgency levels (None = all)
+        self.channels = list(channels)
+        self.email_levels = set(email_levels) if email_levels is not None else None
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.policy = policy or MilestonePolicy.from_settings()
+        self.today = date.today()
+        # Incremental mode: only look at donations changed since the watermark
+        # or that crossed a milestone since the last run's day
+        self.changed_since = changed_since
+        self.last_run_date = last_run_date
+        # Targeted mode: restrict planning to specific donations (e.g. the one just saved)
+        self.donation_ids = list(donation_ids) if donation_ids is not None else None
+        # Sharded mode: (index, count) selects donations with id % count == index
+        self.shard = shard
+        self.scanned = 0
+        self.notifications_created = 0
+        self.profiler = profiler or NULL_PROFILER
+
+    @property
+    def incremental(self) -> bool:
+        return self.changed_since is not None and self.last_run_date is not None
+
+    def get_incremental_filter(self) -> Q:
+        """Donations edited since the watermark or that crossed a milestone since the last run"""
+        condition = Q(last_update__gt=self.changed_since)
+        if self.last_run_date < self.today:
+            # Milestone m is crossed on day (expiry_date - m)
+            for milestone in self.policy.milestones:
+                condition |= Q(
+                    expiry_date__gt=self.last_run_date + timedelta(days=milestone),
+                    expiry_date__lte=self.today + timedelta(days=milestone),
+                )
+        return condition
+
+    def get_candidates(self):
+        """Expiring donations in id order"""
+        candidates = Donation.objects.expiring_within(days=self.days_ahead).order_by('id')
+        if self.incremental:
+            candidates = candidates.filter(self.get_incremental_filter())
+        if self.donation_ids is not None:
+            candidates = candidates.filter(id__in=self.donation_ids)
+        if self.shard is not None:
+            index, count = self.shard
+            candidates = candidates.alias(shard=Mod(F('id'), count)).filter(shard=index)
+        return candidates
+
+    def get_staff_emails(self) -> List[str]:
+        """Resolve admin/staff recipients once per run"""
+        User = get_user_model()
+        return list(
+            User.objects.filter(is_staff=True, email__isnull=False)
+            .exclude(email='')
+            .values_list('email', flat=True)
+        )
+
+    def iter_candidate_rows(self, candidates) -> Iterator[DonationRow]:
+        """Stream candidate donations as lightweight rows"""
+        for row in candidates.values_list(*DonationRow.FIELDS).iterator(chunk_size=self.chunk_size):
+            yield DonationRow(*row)
+
+    def iter_sent_alert_keys(self, candidates) -> Iterator[Tuple[int, Set[Tuple[int, str, str]]]]:
+        """(donation_id, {(milestone, email, channel)}) for candidates with recorded alerts, in donation id order"""
+        if self.force:
+            return
+        rows = (
+            ExpiryAlert.objects.filter(donation__in=candidates.values('id'))
+            .order_by('donation_id')
+            .values_list('donation_id', 'days_before_expiry', 'recipient_email', 'alert_type')
+            .iterator(chunk_size=self.chunk_size)
+        )
+        for donation_id, alerts in groupby(rows, key=lambda row: row[0]):
+            yield donation_id, {(milestone, email, channel) for _, milestone, email, channel in alerts}
+
+    def get_recipients(self, donation: DonationRow, staff_emails: List[str]) -> List[str]:
+        """Donor plus staff recipients for a donation"""
+        recipients = set(staff_emails)
+        if donation.donor_email:
+            recipients.add(donation.donor_email)
+        return sorted(recipients)
+
+    def iter_plan(self) -> Iterator[PlannedAlert]:
+        """Yield every alert that has not been sent yet"""
+        profiler = self.profiler
+        with profiler.phase('recipient_resolution'):
+            staff_emails = self.get_staff_emails()
+        candidates = self.get_candidates()
+
+        # Merge join: both streams are ordered by donation id
+        sent_stream = profiler.timed('dedupe', self.iter_sent_alert_keys(candidates))
+        sent_id, sent = next(sent_stream, (None, set()))
+
+        for donation in profiler.timed('candidate_selection', self.iter_candidate_rows(candidates)):
+            self.scanned += 1
+            while sent_id is not None and sent_id < donation.id:
+                sent_id, sent = next(sent_stream, (None, set()))
+            already_sent = sent if sent_id == donation.id else set()
+
+            days_until_expiry = (donation.expiry_date - self.today).days
+
+            # Skip if already expired (safety check)
+            if days_until_expiry < 0:
+                continue
+
+            milestone = self.policy.milestone_for(days_until_expiry)
+            if milestone is None:
+                continue
+
+            if EMAIL in self.channels and (
+                self.email_levels is None or donation.urgency_level in self.email_levels
+            ):
+                with profiler.phase('recipient_resolution'):
+                    recipients = self.get_recipients(donation, staff_emails)
+                for recipient_email in recipients:
+                    if (milestone, recipient_email, EMAIL) in already_sent:
+                        continue
+                    yield PlannedAlert(donation, recipient_email, days_until_expiry, milestone, EMAIL)
+
+            # In-app notifications go to the donor's account
+            if DASHBOARD in self.channels and donation.donor_id:
+                recipient_email = donation.donor_email or ''
+                if (milestone, recipient_email, DASHBOARD) not in already_sent:
+                    yield PlannedAlert(donation, recipient_email, days_until_expiry, milestone, DASHBOARD)
+
+    def plan(self) -> List[PlannedAlert]:
+        """Return every alert that has not been sent yet"""
+        return list(self.iter_plan())
+
+    def record(self, planned: Iterable[PlannedAlert]) -> int:
+        """
+        Record planned alerts, silently skipping rows another run already wrote,
+        and create the in-app notifications for dashboard alerts alongside them
+        """
+        recorded = 0
+        # One short transaction per batch so a large run never holds locks for long
+        for batch in chunked(planned, self.batch_size):
+            alerts = [
+                ExpiryAlert(
+                    donation_id=item.donation.id,
+                    days_before_expiry=item.milestone,
+                    recipient_email=item.recipient_email,
+                    alert_type=item.channel,
+                )
+                for item in batch
+            ]
+            notifications = [build_expiry_notification(item) for item in batch if item.channel == DASHBOARD]
+            with self.profiler.phase('alert_insert'), transaction.atomic():
+                ExpiryAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+                if notifications:
+                    Notification.objects.bulk_create(notifications)
+            recorded += len(alerts)
+            self.notifications_created += len(notifications)
+        return recorded
+
+
+def build_expiry_notification(item: PlannedAlert) -> Notification:
+    """In-app notification telling a donor their medicine is about to expire"""
+    donation = item.donation
+    if item.days_until_expiry == 0:
+        expires = "expires today"
+    elif item.days_until_expiry == 1:
+        expires = "expires tomorrow"
+    else:
+        expires = f"expires in {item.days_until_expiry} days"
+    return Notification(
+        user_id=donation.donor_id,
+        notification_type=Notification.Type.MEDICINE_EXPIRING,
+        title=f"Medicine expiring: {donation.name}",
+        message=(
+            f"Your donation of {donation.name} (x{donation.quantity}) {expires} "
+            f"({donation.expiry_date.strftime('%B %d, %Y')}). Tracking code: {donation.tracking_code}."
+        ),
+        donation_id=donation.id,
+    )
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Split an iterable into lists of at most `size` items without materialising it"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an 'i/n' shard spec into (i, n) with 0 <= i < n"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"expected INDEX/COUNT such as 0/4, got '{value}'")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be between 0 and {count - 1}")
+    return index, count
+
+
+def group_by_recipient(planned: List[PlannedAlert]) -> Dict[str, List[PlannedAlert]]:
+    """Group planned alerts per recipient, most urgent donation first"""
+    grouped: Dict[str, List[PlannedAlert]] = {}
+    for item in planned:
+        grouped.setdefault(item.recipient_email, []).append(item)
+
+    for items in grouped.values():
+        items.sort(key=lambda item: (
+            URGENCY_ORDER.index(item.donation.urgency_level),
+            item.days_until_expiry,
+            item.donation.name,
+        ))
+    return grouped
@@ -0,0 +1,168 @@
+"""
+Expiry timeline scheduler for HealthBridge
+Sleeps until the next moment a donation crosses an alert milestone instead of polling
+"""
+import logging
+import threading
+import weakref
+from bisect import bisect_right, insort
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from donations.models import Donation
+from .expiry_planner import MilestonePolicy
+
+logger = logging.getLogger(__name__)
+
+# Schedulers running in this process, woken by donation save/delete signals
+_schedulers = weakref.WeakSet()
+
+
+class ExpiryTimeline:
+    """Sorted (expiry_date, donation_id) timeline of live donations"""
+
+    def __init__(self, policy: Optional[MilestonePolicy] = None):
+        self.policy = policy or MilestonePolicy.from_settings()
+        self.entries: List[Tuple[date, int]] = []
+        self.expiry_by_id: Dict[int, date] = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        """(Re)load every live, not yet expired donation in one query"""
+        rows = Donation.objects.filter(
+            expiry_date__gte=date.today(),
+            status__in=[Donation.Status.AVAILABLE, Donation.Status.RESERVED],
+        ).values_list('expiry_date', 'id')
+
+        entries = sorted(rows)
+        with self.lock:
+            self.entries = entries
+            self.expiry_by_id = {donation_id: expiry_date for expiry_date, donation_id in entries}
+
+    def upsert(self, donation_id: int, expiry_date: Optional[date], live: bool = True):
+        """Insert, move or drop a donation after it changed"""
+        with self.lock:
+            self._discard(donation_id)
+            if live and expiry_date and expiry_date >= date.today():
+                insort(self.entries, (expiry_date, donation_id))
+                self.expiry_by_id[donation_id] = expiry_date
+
+    def remove(self, donation_id: int):
+        with self.lock:
+            self._discard(donation_id)
+
+    def _discard(self, donation_id):
+        expiry_date = self.expiry_by_id.pop(donation_id, None)
+        if expiry_date is not None:
+            index = bisect_right(self.entries, (expiry_date, donation_id)) - 1
+            if index >= 0 and self.entries[index] == (expiry_date, donation_id):
+                del self.entries[index]
+
+    def next_crossing(self, today: Optional[date] = None) -> Optional[date]:
+        """
+        First day after `today` on which some donation enters a milestone.
+        Milestone m is crossed on day (expiry_date - m), so for each milestone
+        the first donation expiring after today + m gives the candidate day.
+        """
+        today = today or date.today()
+        best = None
+        with self.lock:
+            for milestone in self.policy.milestones:
+                threshold = today + timedelta(days=milestone)
+                index = bisect_right(self.entries, (threshold, float('inf')))
+                if index < len(self.entries):
+                    crossing = self.entries[index][0] - timedelta(days=milestone)
+                    if best is None or crossing < best:
+                        best = crossing
+        return best
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ExpiryScheduler:
+    """
+    Runs `run_check` whenever a donation crosses an alert milestone, or
+    early when woken by a donation change. Between events it sleeps, capped
+    at EXPIRY_SCHEDULER_MAX_SLEEP so changes made by other processes are
+    picked up eventually. A failing check is retried with exponential
+    backoff instead of waiting for the next crossing.
+
+    If `sweep` is given it runs once per day, before the first check after
+    midnight, to retire donations that expired the day before.
+    """
+
+    def __init__(self, run_check: Callable[[], None], policy: Optional[MilestonePolicy] = None,
+                 max_sleep: Optional[float] = None, retry_base: float = 5.0, retry_max: float = 600.0,
+                 sweep: Optional[Callable[[], object]] = None):
+        self.run_check = run_check
+        self.sweep = sweep
+        self.last_sweep_date = None
+        self.timeline = ExpiryTimeline(policy)
+        self.max_sleep = max_sleep if max_sleep is not None else getattr(
+            settings, 'EXPIRY_SCHEDULER_MAX_SLEEP', 3600
+        )
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.failures = 0
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+
+    def seconds_until_next_check(self, now: Optional[datetime] = None) -> float:
+        """Seconds until the next milestone crossing (local midnight), capped at max_sleep"""
+        now = now or datetime.now()
+        crossing = self.timeline.next_crossing(now.date())
+        if self.sweep is not None:
+            # Donations expire at midnight too
+            tomorrow = now.date() + timedelta(days=1)
+            crossing = min(crossing, tomorrow) if crossing else tomorrow
+        if crossing is None:
+            return self.max_sleep
+        seconds = (datetime.combine(crossing, time.min) - now).total_seconds()
+        return max(0.0, min(seconds, self.max_sleep))
+
+    def retry_delay(self) -> float:
+        """Exponential backoff after consecutive failures"""
+        return min(self.retry_max, self.retry_base * 2 ** max(self.failures - 1, 0))
+
+    def wake(self):
+        """Run a check now instead of waiting for the next crossing"""
+        self.wake_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def run_forever(self):
+        _schedulers.add(self)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    if self.sweep is not None and self.last_sweep_date != date.today():
+                        self.sweep()
+                        self.last_sweep_date = date.today()
+                    self.run_check()
+                    self.timeline.load()
+                except Exception as e:
+                    self.failures += 1
+                    wait = self.retry_delay()
+                    logger.error(f"Expiry check failed ({self.failures} in a row), retrying in {wait:.0f}s: {e}")
+                else:
+                    self.failures = 0
+                    wait = self.seconds_until_next_check()
+                    logger.info(
+                        f"Expiry timeline holds {len(self.timeline)} donations; next check in {wait:.0f}s"
+                    )
+                self.wake_event.wait(wait)
+                self.wake_event.clear()
+        finally:
+            _schedulers.discard(self)
+
+
+def notify_donation_changed(donation_id: int, expiry_date: Optional[date] = None, live: bool = False):
+    """Update running schedulers in this process and wake them early"""
+    for scheduler in list(_schedulers):
+        scheduler.timeline.upsert(donation_id, expiry_date, live=live)
+        scheduler.wake()
@@ -8,6 +8,8 @@ from django.utils import timezone
 from typing import List, Dict, Any
 
 from donations.models import Donation, ExpiryAlert
+from healthbridge_app.run_lock import RunLock, RunLockHeld
+from .expiry_planner import ExpiryAlertPlanner, MilestonePolicy
 
 
 class ExpiryMonitoringService:
@@ -17,26 +19,8 @@ class ExpiryMonitoringService:
         self.User = get_user_model()
     
     def get_expiring_donations(self, days_ahead: int = 10) -> Dict[str, Any]:
-        """Get donations grouped by urgency level"""
-        donations = Donation.objects.expiring_within(days=days_ahead)
-        
-        today = date.today()
-        
-        return {
-            'critical': donations.filter(expiry_date__lte=today + timedelta(days=1)),
-            'high': donations.filter(
-                expiry_date__gt=today + timedelta(days=1),
-                expiry_date__lte=today + timedelta(days=3)
-            ),
-            'medium': donations.filter(
-                expiry_date__gt=today + timedelta(days=3),
-                expiry_date__lte=today + timedelta(days=7)
-            ),
-            'low': donations.filter(
-                expiry_date__gt=today + timedelta(days=7),
-                expiry_date__lte=today + timedelta(days=days_ahead)
-            ),
-        }
+        """Get donations grouped by urgency level (critical, high, medium, low) in one query"""
+        return Donation.objects.expiring_within(days=days_ahead).grouped_by_urgency()
     
     def get_notification_stats(self, days_back: int = 7) -> Dict[str, int]:
         """Get statistics about recent notifications"""
@@ -49,6 +33,7 @@ class ExpiryMonitoringService:
             'unique_donations': alerts.values('donation').distinct().count(),
             'unique_recipients': alerts.values('recipient_email').distinct().count(),
             'email_alerts': alerts.filter(alert_type='email').count(),
+            'dashboard_alerts': alerts.filter(alert_type='dashboard').count(),
         }
     
     def get_user_expiry_summary(self, user) -> Dict[str, Any]:
@@ -74,11 +59,17 @@ class ExpiryMonitoringService:
         if days_until_expiry < 0:
             return False
         
-        # Check if already notified for this specific timeframe
+        # Alerts are keyed on the milestone the donation is currently in
+        milestone = MilestonePolicy.from_settings().milestone_for(days_until_expiry)
+        if milestone is None:
+            return False
+        
+        # Check if already notified for this milestone
         existing_alert = ExpiryAlert.objects.filter(
             donation=donation,
-            days_before_expiry=days_until_expiry,
-            recipient_email=recipient_email
+            days_before_expiry=milestone,
+            recipient_email=recipient_email,
+            alert_type='email',
         ).first()
         
         if existing_alert:
@@ -117,6 +108,27 @@ class ExpiryMonitoringService:
             return f"{emoji} Expires in {days} days"
 
 
+def alert_expiring_donation(donation_id: int, days_ahead: int = 10, lock_wait: float = 30) -> int:
+    """
+    Evaluate and send expiry alerts for a single donation.
+    Uses the normal milestone dedupe and costs the same few queries
+    regardless of how many donations are in the system.
+    Raises RunLockHeld if a full run keeps the lock for longer than
+    `lock_wait` seconds, so a queued job is retried later.
+    """
+    from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand, expiry_lock_name
+    
+    lock = RunLock(expiry_lock_name())
+    if not lock.acquire(wait=lock_wait):
+        raise RunLockHeld(lock.name, lock.holder())
+    try:
+        planner = ExpiryAlertPlanner(days_ahead=days_ahead, donation_ids=[donation_id])
+        summary = ExpiryCommand().process_expiry_notifications(planner, dry_run=False)
+    finally:
+        lock.release()
+    return summary['alerts_planned']
+
+
 # Convenience function for templates
 def get_expiry_service():
     """Get an instance of the expiry monitoring service"""
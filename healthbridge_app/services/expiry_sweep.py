@@ -0,0 +1,102 @@
+"""
+Expired inventory sweep for HealthBridge
+Moves expired donations out of the live set in a fixed number of statements
+"""
+import logging
+from datetime import date
+from typing import Dict, Optional
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from donations.models import Donation, ExpiryCalendar
+from healthbridge_app.models import Notification
+from requests.models import MedicineRequest
+
+logger = logging.getLogger(__name__)
+
+def get_expired_live_donations(today: Optional[date] = None):
+    """Donations past their expiry date that are still available or reserved"""
+    today = today or date.today()
+    return Donation.objects.filter(expiry_date__lt=today, status__in=Donation.LIVE_STATUSES)
+
+
+def build_sweep_notification(donor_id: int, count: int, units: int) -> Notification:
+    """One summary notification per donor instead of one per donation"""
+    return Notification(
+        user_id=donor_id,
+        notification_type=Notification.Type.MEDICINE_EXPIRED,
+        title=f"{count} donated medicine{'s' if count != 1 else ''} expired",
+        message=(
+            f"{count} of your donations ({units} unit{'s' if units != 1 else ''} in total) passed their "
+            f"expiry date and were removed from the available inventory. Please dispose of them safely."
+        ),
+    )
+
+
+def sweep_expired_donations(today: Optional[date] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Mark every expired live donation as EXPIRED.
+
+    Runs five statements regardless of how many donations expired:
+    1. per-donor counts of the donations being swept
+    2. release requests still open against them (back to PENDING, unmatched);
+       delivered (FULFILLED, CLAIMED) and CANCELLED requests keep theirs as history
+    3. move the donations to EXPIRED
+    4. bulk insert one summary notification per donor
+    5. drop the expiry calendar days that have passed
+    """
+    expired = get_expired_live_donations(today)
+    summary = {'donations_expired': 0, 'requests_released': 0, 'donors_notified': 0}
+
+    with transaction.atomic():
+        per_donor = list(
+            expired.filter(donor__isnull=False)
+            .values('donor_id')
+            .annotate(count=Count('id'), units=Sum('quantity'))
+            .order_by('donor_id')
+        )
+
+        open_requests = MedicineRequest.objects.filter(
+            matched_donation__in=expired.values('id'),
+            status__in=MedicineRequest.OPEN_STATUSES,
+        )
+
+        if dry_run:
+            summary['requests_released'] = open_requests.count()
+            summary['donations_expired'] = expired.count()
+            summary['donors_notified'] = len(per_donor)
+            return summary
+
+        # Requests first: afterwards the donations no longer match the expired filter
+        summary['requests_released'] = open_requests.update(
+            status=MedicineRequest.Status.PENDING,
+            matched_donation=None,
+            updated_at=timezone.now(),
+        )
+
+        # update() skips auto_now and save signals; set last_update so incremental
+        # runs and the change feed still see the change
+        summary['donations_expired'] = expired.update(
+            status=Donation.Status.EXPIRED,
+            last_update=timezone.now(),
+        )
+
+        notifications = [
+            build_sweep_notification(row['donor_id'], row['count'], row['units'] or 0)
+            for row in per_donor
+        ]
+        Notification.objects.bulk_create(notifications)
+        summary['donors_notified'] = len(notifications)
+
+        # The update above bypasses the calendar signals; the swept donations
+        # all sit on past days, which are no longer needed
+        ExpiryCalendar.objects.prune(today)
+
+    if summary['donations_expired']:
+        logger.info(
+            f"Swept {summary['donations_expired']} expired donations, released "
+            f"{summary['requests_released']} open requests, notified {summary['donors_notified']} donors"
+        )
+    return summary
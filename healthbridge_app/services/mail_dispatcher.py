@@ -0,0 +1,184 @@
+"""
+Concurrent email dispatch for HealthBridge
+Sends messages over a small pool of persistent SMTP connections, retrying
+only the messages that failed, with exponential backoff
+"""
+import logging
+import smtplib
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from .expiry_planner import chunked
+
+logger = logging.getLogger(__name__)
+
+# (subject, message, from_email, recipient_list), as accepted by send_mass_mail
+MailTuple = Tuple[str, str, str, Sequence[str]]
+
+
+def as_email_message(message: Union[EmailMessage, MailTuple]) -> EmailMessage:
+    if isinstance(message, EmailMessage):
+        return message
+    subject, body, from_email, recipient_list = message
+    return EmailMessage(subject, body, from_email, list(recipient_list))
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """5xx replies (bad address, rejected content) will fail again; anything else is worth a retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    code = getattr(error, 'smtp_code', None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class MailDispatcher:
+    """
+    Sends any number of messages with bounded concurrency:
+
+        dispatcher = MailDispatcher()
+        sent = dispatcher.send(messages)   # EmailMessages or send_mass_mail tuples
+
+    Messages are split into chunks of `chunk_size` and handed to a thread
+    pool of `concurrency` workers (keep it at or below the provider's
+    connection limit). Each worker thread opens one SMTP connection and
+    keeps it for every chunk it sends. Messages go out one at a time on
+    that connection, so one bad message neither aborts nor resends the
+    rest of its chunk. Failed messages are retried up to `max_attempts`
+    times with exponential backoff; permanent (5xx) failures are not retried.
+
+    `messages` may be a generator; it is consumed on the calling thread a
+    few chunks ahead of the workers, never all at once.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, chunk_size: Optional[int] = None,
+                 max_attempts: Optional[int] = None, retry_base: Optional[float] = None,
+                 retry_max: Optional[float] = None, backend: Optional[str] = None,
+                 on_chunk: Optional[Callable[[int, int, float], None]] = None):
+        self.concurrency = max(1, concurrency or getattr(settings, 'EMAIL_MAX_CONCURRENCY', 4))
+        self.chunk_size = max(1, chunk_size or getattr(settings, 'EMAIL_CHUNK_SIZE', 100))
+        self.max_attempts = max(1, max_attempts or getattr(settings, 'EMAIL_MAX_ATTEMPTS', 3))
+        self.retry_base = retry_base if retry_base is not None else getattr(settings, 'EMAIL_RETRY_BASE_SECONDS', 2)
+        self.retry_max = retry_max if retry_max is not None else getattr(settings, 'EMAIL_RETRY_MAX_SECONDS', 60)
+        self.backend = backend
+        # Called as on_chunk(messages, sent, seconds) after each chunk, under the dispatcher lock
+        self.on_chunk = on_chunk
+        self.stats = Counter()
+        # Seconds each accepted message took on the wire, in completion order
+        self.latencies: List[float] = []
+        self.failures: List[Tuple[EmailMessage, Exception]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+
+    def retry_delay(self, attempt: int) -> float:
+        """Backoff before retry number `attempt` (1-based)"""
+        return min(self.retry_max, self.retry_base * 2 ** max(attempt - 1, 0))
+
+    def send(self, messages: Iterable[Union[EmailMessage, MailTuple]]) -> int:
+        """Send every message, returning how many were accepted by the server"""
+        sent = 0
+        in_flight = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='mail') as pool:
+                for chunk in chunked(messages, self.chunk_size):
+                    # Keep the workers busy without rendering the whole batch up front
+                    while len(in_flight) >= self.concurrency * 2:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        sent += sum(future.result() for future in done)
+                    in_flight.add(pool.submit(self._send_chunk, [as_email_message(m) for m in chunk]))
+                sent += sum(future.result() for future in wait(in_flight).done)
+        finally:
+            self.close()
+        return sent
+
+    def close(self):
+        """Close every connection the worker threads opened"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.warning(f"Closing mail connection failed: {e}")
+
+    # ---------- Worker threads ----------
+
+    def _connection(self):
+        """This thread's open connection, opened on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = get_connection(self.backend, fail_silently=False)
+            connection.open()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+                self.stats['connections'] += 1
+        return connection
+
+    def _drop_connection(self):
+        """Forget a connection that may be broken; the next message reopens one"""
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is None:
+            return
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _send_chunk(self, messages: List[EmailMessage]) -> int:
+        started = time.perf_counter()
+        pending = messages
+        sent = 0
+        attempt = 1
+        while True:
+            failed = []
+            latencies = []
+            for message in pending:
+                try:
+                    message_started = time.perf_counter()
+                    accepted = self._connection().send_messages([message]) or 0
+                    if accepted:
+                        latencies.append(time.perf_counter() - message_started)
+                    sent += accepted
+                except Exception as e:
+                    if is_permanent_failure(e) or attempt >= self.max_attempts:
+                        self._give_up(message, e)
+                    else:
+                        failed.append(message)
+                        # Connection-level errors leave the session unusable
+                        if not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)):
+                            self._drop_connection()
+            with self._lock:
+                self.latencies.extend(latencies)
+            if not failed:
+                break
+            delay = self.retry_delay(attempt)
+            logger.warning(f"Retrying {len(failed)} of {len(messages)} emails in {delay:.0f}s (attempt {attempt + 1})")
+            with self._lock:
+                self.stats['retried'] += len(failed)
+            time.sleep(delay)
+            pending = failed
+            attempt += 1
+
+        with self._lock:
+            self.stats['chunks'] += 1
+            self.stats['sent'] += sent
+            self.stats['failed'] += len(messages) - sent
+            if self.on_chunk:
+                self.on_chunk(len(messages), sent, time.perf_counter() - started)
+        return sent
+
+    def _give_up(self, message: EmailMessage, error: Exception):
+        logger.error(f"Failed to send email to {', '.join(message.to)}: {error}")
+        with self._lock:
+            self.failures.append((message, error))
@@ -1,4 +1,5 @@
 from ..models import GenericMedicine, BrandMedicine
+from ..search_backend import get_search_backend
 from django.db.models import Q
 
 class MedicineService:
@@ -8,13 +9,19 @@ class MedicineService:
         Retrieves all medicines (generic + branded) related to user input.
         """
         user_input = user_input.strip().lower()
+        search = get_search_backend()
 
-        # Find generic matches
-        generics = GenericMedicine.objects.filter(name__icontains=user_input)
+        # Find generic matches (indexed, best matches first)
+        generics = search.filter(GenericMedicine.objects.all(), 'name', user_input)
 
         # Find brand matches linked to any matching generics or direct brand name
-        brands = BrandMedicine.objects.filter(
-            Q(generic__in=generics) | Q(brand_name__icontains=user_input)
+        brand_matches = search.match(BrandMedicine.objects.all(), 'brand_name', user_input)
+        brands = search.rank(
+            BrandMedicine.objects.filter(
+                Q(generic__in=generics.values('pk')) | Q(pk__in=brand_matches.values('pk'))
+            ),
+            'brand_name',
+            user_input,
         ).select_related('generic')
 
         result = {
@@ -0,0 +1,144 @@
+"""
+Lightweight run profiler for HealthBridge batch commands
+Records exclusive wall time per phase, database queries and SMTP batch latency
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from django.db import connections
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class RunProfiler:
+    """
+    Collects timings for one run:
+
+        profiler = RunProfiler()
+        with profiler.capture_queries(), profiler.phase('candidate_selection'):
+            ...
+        report = profiler.report()
+
+    Phases are exclusive: time spent in a nested phase is not counted in
+    the enclosing one, so the phase times add up to the run's wall time.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phase_seconds: Dict[str, float] = {}
+        self.phase_calls: Dict[str, int] = {}
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.smtp_batches: List[Dict[str, Any]] = []
+        self._stack: List[str] = []
+        self._mark = self.started
+
+    def _switch(self):
+        """Charge the time since the last switch to the phase on top of the stack"""
+        now = time.perf_counter()
+        if self._stack:
+            name = self._stack[-1]
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + now - self._mark
+        self._mark = now
+
+    @contextmanager
+    def phase(self, name: str):
+        self._switch()
+        self._stack.append(name)
+        self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            self._switch()
+            self._stack.pop()
+
+    def timed(self, name: str, iterable: Iterable) -> Iterator:
+        """Charge the time spent producing each item of `iterable` to `name`"""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def _query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_seconds += time.perf_counter() - started
+
+    def capture_queries(self, using: str = 'default'):
+        """Count queries and their time on a connection while the block runs"""
+        return connections[using].execute_wrapper(self._query_wrapper)
+
+    def record_smtp(self, messages: int, seconds: float, ok: bool = True):
+        self.smtp_batches.append({'messages': messages, 'ms': round(seconds * 1000, 1), 'ok': ok})
+
+    def merge(self, report: Dict[str, Any]):
+        """Add another profiler's report (e.g. from a shard worker process)"""
+        for name, ms in report.get('phases_ms', {}).items():
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + ms / 1000
+        for name, calls in report.get('phase_calls', {}).items():
+            self.phase_calls[name] = self.phase_calls.get(name, 0) + calls
+        self.query_count += report.get('queries', {}).get('count', 0)
+        self.query_seconds += report.get('queries', {}).get('time_ms', 0) / 1000
+        self.smtp_batches.extend(report.get('smtp', {}).get('batches', []))
+
+    def report(self, **extra) -> Dict[str, Any]:
+        self._switch()
+        total = time.perf_counter() - self.started
+        latencies = [batch['ms'] for batch in self.smtp_batches]
+        return {
+            **extra,
+            'total_ms': round(total * 1000, 1),
+            'unattributed_ms': round(max(total - sum(self.phase_seconds.values()), 0.0) * 1000, 1),
+            'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phase_seconds.items()},
+            'phase_calls': dict(self.phase_calls),
+            'queries': {'count': self.query_count, 'time_ms': round(self.query_seconds * 1000, 1)},
+            'smtp': {
+                'batch_count': len(self.smtp_batches),
+                'messages': sum(batch['messages'] for batch in self.smtp_batches),
+                'p50_ms': percentile(latencies, 0.5),
+                'p99_ms': percentile(latencies, 0.99),
+                'max_ms': max(latencies) if latencies else None,
+                'batches': self.smtp_batches,
+            },
+        }
+
+
+class NullProfiler:
+    """Drop-in profiler that records nothing, used when profiling is off"""
+
+    enabled = False
+
+    def phase(self, name: str):
+        return nullcontext()
+
+    def timed(self, name: str, iterable: Iterable) -> Iterable:
+        return iterable
+
+    def capture_queries(self, using: str = 'default'):
+        return nullcontext()
+
+    def record_smtp(self, messages: int, seconds: float, ok: bool = True):
+        pass
+
+    def merge(self, report: Dict[str, Any]):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
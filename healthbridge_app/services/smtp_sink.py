@@ -0,0 +1,91 @@
+"""
+In-process SMTP sink for local email benchmarks
+Accepts and discards mail on localhost, counting connections and messages
+"""
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        sink = self.server
+        sink.count('connections')
+        self.reply("220 healthbridge-sink ESMTP")
+        for raw in self.rfile:
+            command = raw.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b"250-healthbridge-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+            elif verb in ('HELO', 'MAIL', 'RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                sink.count('recipients')
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                if sink.latency:
+                    time.sleep(sink.latency)
+                sink.count('messages')
+                self.reply("250 OK: queued")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Local SMTP server on a free port, one thread per connection:
+
+        with SMTPSink(latency=0.02) as sink:
+            ...send to 127.0.0.1:sink.port...
+        sink.messages, sink.connections
+
+    `latency` adds a delay before each message is acknowledged, to mimic a
+    remote provider.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        super().__init__((host, port), SMTPSinkHandler)
+        self.latency = latency
+        self.connections = 0
+        self.recipients = 0
+        self.messages = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -2,17 +2,62 @@
 Real-time expiry monitoring using Django signals
 This triggers immediately when donations are added/updated
 """
-from django.db.models.signals import post_save, post_delete
+from collections import Counter
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
-from donations.models import Donation, ExpiryAlert
+from donations.models import Donation, ExpiryAlert, ExpiryCalendar
+from .autocomplete_index import get_autocomplete_index, normalize
+from .fuzzy_index import get_fuzzy_index
+from .jobs import enqueue
+from .models import BrandMedicine, GenericMedicine, MedicineCatalogState
+from .search_backend import ensure_sqlite_fts
+from .services.expiry_scheduler import notify_donation_changed
+
+def calendar_changes(old_entry, new_entry):
+    """Per-day (donations, units) deltas for moving a donation from one calendar entry to another"""
+    donations, units = Counter(), Counter()
+    if old_entry:
+        donations[old_entry[0]] -= 1
+        units[old_entry[0]] -= old_entry[1]
+    if new_entry:
+        donations[new_entry[0]] += 1
+        units[new_entry[0]] += new_entry[1]
+    return {day: (donations[day], units[day]) for day in donations}
+
+@receiver(pre_save, sender=Donation)
+def remember_calendar_entry(sender, instance, raw=False, **kwargs):
+    """
+    Make sure the instance knows its stored calendar entry before it is
+    overwritten (rows loaded normally already carry it from from_db)
+    """
+    if raw or hasattr(instance, '_calendar_entry'):
+        return
+    stored = None
+    if instance.pk is not None:  # may be an update even if the instance was built by hand
+        stored = Donation.objects.filter(pk=instance.pk).only('expiry_date', 'quantity', 'status').first()
+    instance._calendar_entry = stored.calendar_entry() if stored else None
+
+@receiver(post_save, sender=Donation)
+def update_calendar_on_donation_save(sender, instance, raw=False, **kwargs):
+    """Move the donation's units to its new expiry day in the expiry calendar"""
+    if raw:
+        return
+    new_entry = instance.calendar_entry()
+    ExpiryCalendar.objects.apply(calendar_changes(getattr(instance, '_calendar_entry', None), new_entry))
+    instance._calendar_entry = new_entry
 
 @receiver(post_save, sender=Donation)
-def check_expiry_on_donation_save(sender, instance, created, **kwargs):
+def check_expiry_on_donation_save(sender, instance, created, raw=False, **kwargs):
     """
     Automatically check expiry when a donation is created or updated
     """
+    if raw:
+        return
+    
     if instance.expiry_date:
         # Ensure expiry_date is a date object
         from datetime import datetime, date
@@ -25,36 +70,29 @@ def check_expiry_on_donation_save(sender, instance, created, **kwargs):
                 print(f"❌ Invalid date format: {expiry_date}")
                 return
         
+        # Keep any in-process expiry scheduler's timeline current
+        notify_donation_changed(
+            instance.pk,
+            expiry_date,
+            live=instance.status in [Donation.Status.AVAILABLE, Donation.Status.RESERVED],
+        )
+        
         days_until_expiry = (expiry_date - timezone.now().date()).days
         
         # Check if this donation needs immediate attention
-        if days_until_expiry <= 10:  # Within 10 days
+        if 0 <= days_until_expiry <= 10:  # Within 10 days
             print(f"🚨 REAL-TIME ALERT: {instance.name} expires in {days_until_expiry} days!")
             
             # Determine urgency level
             urgency = "CRITICAL" if days_until_expiry <= 3 else "WARNING" if days_until_expiry <= 7 else "LOW"
             print(f"📊 Urgency Level: {urgency} | Expiry Date: {expiry_date}")
             
-            # AUTOMATICALLY SEND EMAILS in real-time
+            # Queue email alerts for this donation only; the background worker
+            # sends them so SMTP never runs inside the web request
             try:
-                from .management.commands.check_expiry import Command as ExpiryCommand
-                expiry_command = ExpiryCommand()
-                
-                # Provide default options for the command
-                default_options = {
-                    'days': 10,
-                    'dry_run': False,  # Send real emails
-                    'force': True,     # Override duplicate protection for real-time
-                    'critical_only': days_until_expiry <= 3,  # Only critical if very urgent
-                    'verbosity': 1
-                }
-                
-                print(f"📧 Automatically sending email alerts to staff...")
-                expiry_command.handle(**default_options)
-                print(f"✅ Real-time email alerts sent successfully!")
-                
+                enqueue('expiry.alert_donation', donation_id=instance.pk)
             except Exception as e:
-                print(f"⚠️ Real-time email failed: {e}")
+                print(f"⚠️ Could not queue real-time email alert: {e}")
                 print(f"💡 Fallback: Daily automation will catch this at 9:00 AM")
 
 @receiver(post_delete, sender=Donation)
@@ -63,4 +101,69 @@ def cleanup_alerts_on_donation_delete(sender, instance, **kwargs):
     Clean up alerts when donation is deleted
     """
     ExpiryAlert.objects.filter(donation=instance).delete()
-    print(f"🗑️ Cleaned up alerts for deleted donation: {instance.name}")
\ No newline at end of file
+    old_entry = getattr(instance, '_calendar_entry', instance.calendar_entry())
+    ExpiryCalendar.objects.apply(calendar_changes(old_entry, None))
+    notify_donation_changed(instance.pk)
+    print(f"🗑️ Cleaned up alerts for deleted donation: {instance.name}")
+
+# Fields whose values the autocomplete index suggests, per model
+AUTOCOMPLETE_FIELDS = {Donation: 'name', GenericMedicine: 'name', BrandMedicine: 'brand_name'}
+
+@receiver(pre_save, sender=Donation)
+@receiver(pre_save, sender=GenericMedicine)
+@receiver(pre_save, sender=BrandMedicine)
+def remember_indexed_name(sender, instance, raw=False, **kwargs):
+    """Look up the stored name of a row about to be saved, if from_db didn't already record it"""
+    # Needed to keep this process's index current, and to count renames for the shared catalog
+    needed = get_autocomplete_index().loaded or getattr(settings, 'MEDICINE_CATALOG_PATH', '')
+    if raw or hasattr(instance, '_indexed_name') or not needed:
+        return
+    field = AUTOCOMPLETE_FIELDS[sender]
+    instance._indexed_name = None
+    if instance.pk is not None:
+        instance._indexed_name = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+@receiver(post_save, sender=Donation)
+@receiver(post_save, sender=GenericMedicine)
+@receiver(post_save, sender=BrandMedicine)
+def update_autocomplete_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Add a new or renamed medicine name to this process's autocomplete index
+    once committed, and count renames so the shared catalog gets rebuilt
+    """
+    if raw:
+        return
+    old_name = getattr(instance, '_indexed_name', None)
+    new_name = getattr(instance, AUTOCOMPLETE_FIELDS[sender])
+    instance._indexed_name = new_name
+    transaction.on_commit(lambda: get_autocomplete_index().replace(old_name, new_name))
+    transaction.on_commit(lambda: get_fuzzy_index().add(new_name or ''))
+    if old_name and normalize(old_name) != normalize(new_name):
+        note_name_change()
+
+@receiver(post_delete, sender=Donation)
+@receiver(post_delete, sender=GenericMedicine)
+@receiver(post_delete, sender=BrandMedicine)
+def update_autocomplete_on_delete(sender, instance, **kwargs):
+    """Drop a deleted row's name from the index (kept while other rows still use it)"""
+    name = getattr(instance, '_indexed_name', getattr(instance, AUTOCOMPLETE_FIELDS[sender]))
+    transaction.on_commit(lambda: get_autocomplete_index().remove(name))
+    note_name_change()
+
+def note_name_change():
+    """Count a renamed or deleted medicine name, marking every host's shared catalog out of date"""
+    if not getattr(settings, 'MEDICINE_CATALOG_PATH', ''):
+        return
+    MedicineCatalogState.bump()
+    transaction.on_commit(lambda: get_autocomplete_index().note_name_change())
+
+@receiver(post_migrate)
+def ensure_search_tables(sender, using='default', **kwargs):
+    """
+    Recreate SQLite's FTS5 search tables/triggers if a migration rebuilt a
+    searched table (PostgreSQL uses trigram indexes from a migration instead)
+    """
+    if sender.name != 'healthbridge_app' or connections[using].vendor != 'sqlite':
+        return
+    if not ensure_sqlite_fts(connections[using]):
+        print("⚠️ SQLite has no FTS5 trigram tokenizer; medicine search will not be indexed")
@@ -3,9 +3,6 @@ Background task monitoring using Celery
 Runs continuous monitoring in the background
 """
 from celery import Celery
-from django.utils import timezone
-from datetime import timedelta
-import time
 
 # Create Celery app
 app = Celery('healthbridge_expiry')
@@ -14,30 +11,30 @@ app = Celery('healthbridge_expiry')
 def continuous_expiry_monitor():
     """
     Continuously monitor for expiring medicines
-    More efficient than daily checks
+    Sleeps until the next donation crosses an alert milestone
+    instead of polling on a fixed interval
     """
-    from donations.models import Donation
-    from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand
+    from django.core.management import call_command
+    from donations.models import Donation, ExpiryCalendar
+    from healthbridge_app.change_feed import start_listener
+    from healthbridge_app.services.expiry_scheduler import ExpiryScheduler
+    from healthbridge_app.services.expiry_sweep import sweep_expired_donations
     
-    while True:
-        # Check every 4 hours instead of daily
-        current_time = timezone.now()
-        
-        # Quick check - only run full check if we might have new expiring items
-        near_expiry = Donation.objects.filter(
-            expiry_date__lte=current_time.date() + timedelta(days=10),
-            expiry_date__gte=current_time.date()
-        ).count()
-        
-        if near_expiry > 0:
-            print(f"🔍 Found {near_expiry} items approaching expiry - running full check")
-            expiry_command = ExpiryCommand()
-            expiry_command.handle(verbosity=1)
-        else:
-            print("✅ No items approaching expiry")
-        
-        # Wait 4 hours before next check
-        time.sleep(14400)  # 4 hours = 14400 seconds
+    def run_check():
+        # Read the per-day calendar instead of counting the donations table
+        upcoming = ExpiryCalendar.objects.expiring_within(days=10)
+        if not upcoming['donations']:
+            print("✅ Nothing expiring within 10 days, skipping check")
+            return
+        print(f"🔍 Running incremental expiry check ({upcoming['donations']} donations expiring within 10 days)")
+        call_command('check_expiry', incremental=True)
+    
+    scheduler = ExpiryScheduler(run_check, sweep=sweep_expired_donations)
+    feed = start_listener(lambda event: scheduler.wake(), tables=[Donation._meta.db_table])
+    try:
+        scheduler.run_forever()
+    finally:
+        feed.stop()
 
 @app.task
 def immediate_expiry_check(donation_id):
@@ -45,17 +42,8 @@ def immediate_expiry_check(donation_id):
     Immediate check for a specific donation
     Triggered when donations are added/updated
     """
-    from donations.models import Donation
-    from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand
+    from healthbridge_app.services.expiry_service import alert_expiring_donation
     
-    try:
-        donation = Donation.objects.get(id=donation_id)
-        if donation.expiry_date:
-            days_until_expiry = (donation.expiry_date - timezone.now().date()).days
-            
-            if days_until_expiry <= 10:
-                print(f"⚡ IMMEDIATE CHECK: {donation.medicine_name} expires in {days_until_expiry} days")
-                expiry_command = ExpiryCommand()
-                expiry_command.handle(force=True)
-    except Donation.DoesNotExist:
-        pass
\ No newline at end of file
+    alerts_sent = alert_expiring_donation(donation_id)
+    if alerts_sent:
+        print(f"⚡ IMMEDIATE CHECK: sent {alerts_sent} alerts for donation {donation_id}")
@@ -1,4 +1,4 @@
-from datetime import date, timedelta
+from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
@@ -9,7 +9,10 @@ from django.core.cache import cache
 from django.contrib.auth.views import PasswordResetView, PasswordResetDoneView, PasswordResetConfirmView, PasswordResetCompleteView
 import logging
 
-from .models import GenericMedicine, BrandMedicine
+from .models import BrandMedicine
+from .autocomplete_index import autocomplete
+from .fuzzy_index import fuzzy_filter
+from .search_backend import get_search_backend
 from donations.models import Donation
 from requests.models import MedicineRequest
 
@@ -119,29 +122,21 @@ def dashboard(request):
     # If user is authenticated, show their expiring donations
     if request.user.is_authenticated:
         # Get user's donations expiring within 10 days using custom manager
-        user_expiring = Donation.objects.expiring_within(days=10).filter(donor=request.user)
+        user_expiring = list(Donation.objects.expiring_within(days=10).filter(donor=request.user).with_urgency())
         context['user_expiring_donations'] = user_expiring
-        context['user_critical_donations'] = user_expiring.filter(expiry_date__lte=date.today() + timedelta(days=3))
+        context['user_critical_donations'] = [donation for donation in user_expiring if donation.days_left <= 3]
         
         # If user is admin/staff, show all expiring donations with urgency levels
         if request.user.is_staff:
-            all_expiring = Donation.objects.expiring_within(days=14)
+            # Group by urgency for better dashboard display (one query for every bucket)
+            all_expiring = Donation.objects.expiring_within(days=14).grouped_by_urgency()
             
-            # Group by urgency for better dashboard display
-            context['critical_donations'] = all_expiring.filter(expiry_date__lte=date.today() + timedelta(days=1))
-            context['high_priority_donations'] = all_expiring.filter(
-                expiry_date__gt=date.today() + timedelta(days=1),
-                expiry_date__lte=date.today() + timedelta(days=3)
-            )
-            context['medium_priority_donations'] = all_expiring.filter(
-                expiry_date__gt=date.today() + timedelta(days=3),
-                expiry_date__lte=date.today() + timedelta(days=7)
-            )
-            context['low_priority_donations'] = all_expiring.filter(
-                expiry_date__gt=date.today() + timedelta(days=7)
-            )
+            context['critical_donations'] = all_expiring['critical']
+            context['high_priority_donations'] = all_expiring['high']
+            context['medium_priority_donations'] = all_expiring['medium']
+            context['low_priority_donations'] = all_expiring['low']
             
-            context['total_expiring_count'] = all_expiring.count()
+            context['total_expiring_count'] = sum(len(bucket) for bucket in all_expiring.values())
             
             # Recent alerts for admin
             from donations.models import ExpiryAlert
@@ -170,25 +165,18 @@ def medicine_autocomplete(request):
     if not query or len(query) < 2:
         return JsonResponse({'suggestions': []})
     
-    # Try to get from cache first (cache for 5 minutes)
+    # Word-prefix matches, typos corrected, from the shared catalog or this process's index (no query)
+    suggestions = autocomplete(query, limit=10)
+    if suggestions:
+        return JsonResponse({'suggestions': suggestions})
+    
+    # Mid-word matches ("ceta" in "Paracetamol") come from the search index; try the cache first
     cache_key = f'autocomplete_{query}'
     cached_result = cache.get(cache_key)
     if cached_result is not None:
         return JsonResponse({'suggestions': cached_result})
     
-    # Get unique medicine names from donations
-    donation_medicines = Donation.objects.filter(
-        name__icontains=query
-    ).values_list('name', flat=True).distinct()[:5]
-    
-    # Get unique medicine names from generic medicines  
-    generic_medicines = GenericMedicine.objects.filter(
-        name__icontains=query
-    ).values_list('name', flat=True).distinct()[:5]
-    
-    # Combine and deduplicate
-    all_medicines = list(set(list(donation_medicines) + list(generic_medicines)))
-    suggestions = sorted(all_medicines)[:10]  # Limit to 10 suggestions
+    suggestions = get_search_backend().suggest(query, limit=10)
     
     # Cache the result for 5 minutes (300 seconds)
     cache.set(cache_key, suggestions, 300)
@@ -204,13 +192,16 @@ def medicine_search(request):
         approval_status=Donation.ApprovalStatus.APPROVED,
         quantity__gt=0
     )
+    corrected_query = None
 
     if query:
-        medicines = medicines.filter(name__icontains=query)
+        # Retried with corrected spelling ("amoxicilin") when nothing matches as typed
+        medicines, corrected_query = fuzzy_filter(medicines, 'name', query)
 
     return render(request, 'donations/medicine_search.html', {
         'medicines': medicines,
-        'query': query
+        'query': query,
+        'corrected_query': corrected_query,
     })
 
 # ---------- DONATE ----------
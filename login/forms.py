@@ -0,0 +1,26 @@
+from django.contrib.auth.forms import PasswordResetForm
+
+from healthbridge_app.jobs import enqueue
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """
+    Password reset form that hands delivery to the background job queue,
+    so the request never waits on SMTP. Only the user id and site details
+    are queued; the worker makes the reset token when it sends the email,
+    so no working reset link is stored in the job table.
+    """
+
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        enqueue(
+            'auth.password_reset_email',
+            user_id=context['user'].pk,
+            domain=context['domain'],
+            site_name=context['site_name'],
+            protocol=context['protocol'],
+            subject_template_name=subject_template_name,
+            email_template_name=email_template_name,
+            html_email_template_name=html_email_template_name,
+            from_email=from_email,
+        )
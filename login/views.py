@@ -11,6 +11,8 @@ from django.contrib import messages
 from django.conf import settings
 import logging
 
+from .forms import QueuedPasswordResetForm
+
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
@@ -87,6 +89,7 @@ def logout_view(request):
 class CustomPasswordResetView(PasswordResetView):
     template_name = 'login/password_reset.html'
     email_template_name = 'login/password_reset_email.html'
+    form_class = QueuedPasswordResetForm
     success_url = reverse_lazy('login:password_reset_done')
     
     def dispatch(self, request, *args, **kwargs):
@@ -102,7 +105,7 @@ class CustomPasswordResetView(PasswordResetView):
         return super().dispatch(request, *args, **kwargs)
     
     def form_valid(self, form):
-        """Override to add error handling and prevent worker timeout"""
+        """Queue the reset email; the background worker sends it and retries on failure"""
         # Check if email is configured
         if not settings.EMAIL_HOST_USER or not settings.EMAIL_HOST_PASSWORD:
             logger.error("Email credentials not configured")
@@ -110,17 +113,14 @@ class CustomPasswordResetView(PasswordResetView):
             return redirect(self.success_url)
         
         try:
-            # Log attempt (without sensitive info)
-            logger.info(f"Attempting password reset email via {settings.EMAIL_HOST}")
-            
-            # Try to send the email with timeout protection
+            # Only writes a job row; no SMTP round trip inside the request
             response = super().form_valid(form)
-            logger.info("Password reset email sent successfully")
+            logger.info("Password reset email queued")
             return response
             
         except Exception as e:
             # Log the error but don't expose it to user
-            logger.error(f"Password reset email failed: {type(e).__name__}: {str(e)}")
+            logger.error(f"Queueing password reset email failed: {type(e).__name__}: {str(e)}")
             # Still redirect to success page (security - don't reveal if email exists)
             return redirect(self.success_url)
 
@@ -1,13 +1,14 @@
 """
 Supabase Database Monitor for HealthBridge
 Monitors Supabase PostgreSQL database and triggers expiry checks
-Uses periodic polling since Supabase is a remote database
+Checks run in-process against one warm Django instance and database connection
 Runs silently in background without popup windows
 """
-import time
+import json
 import os
-import sys
-import subprocess
+import signal
+import time
+from io import StringIO
 from pathlib import Path
 from datetime import datetime
 import django
@@ -58,46 +59,76 @@ def monitor_database_changes():
         print(f"❌ Django setup failed: {e}")
         return
     
-    print("🔄 Monitoring for expiring medicines every 2 minutes...")
-    print("Press Ctrl+C to stop\n")
+    from django.core.management import call_command
+    from django.db import close_old_connections
+    from donations.models import Donation, ExpiryCalendar
+    from healthbridge_app.change_feed import start_listener
+    from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand
+    from healthbridge_app.services.expiry_scheduler import ExpiryScheduler
+    from healthbridge_app.services.expiry_sweep import sweep_expired_donations
     
-    check_interval = 120  # Check every 2 minutes
+    cycle = 0
     
-    while True:
+    def run_check():
+        """Run one incremental check in this process, reusing the warm DB connection"""
+        nonlocal cycle
+        cycle += 1
+        started = time.perf_counter()
+        timings = {
+            'cycle': cycle,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        
+        # Drops the connection only if it is broken or older than CONN_MAX_AGE
+        close_old_connections()
+        
+        # A few calendar rows say whether anything is in the alert window at all
+        upcoming = ExpiryCalendar.objects.expiring_within(days=10)
+        if not upcoming['donations']:
+            timings.update(status='skipped', reason='nothing expiring within 10 days')
+            timings['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            print(json.dumps(timings), flush=True)
+            return
+        
+        command = ExpiryCommand()
+        output = StringIO()
         try:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            print(f"📊 [{timestamp}] Running expiry check...")
-            
-            # Run expiry check command silently (no popup window)
-            os.chdir(script_dir)
-            result = subprocess.run(
-                [sys.executable, 'manage.py', 'check_expiry'],
-                capture_output=True,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-            
-            # Print output for logging purposes
-            if result.stdout:
-                print(result.stdout.strip())
-            
-            if result.returncode == 0:
-                print(f"✅ Check completed successfully")
-            else:
-                print(f"⚠️  Check completed with warnings (exit code: {result.returncode})")
-                if result.stderr:
-                    print(f"Error: {result.stderr.strip()}")
-            
-            print(f"⏰ Next check in {check_interval} seconds...\n")
-            time.sleep(check_interval)
-            
-        except KeyboardInterrupt:
-            print("\n🛑 Monitoring stopped by user")
-            break
+            call_command(command, incremental=True, stdout=output)
         except Exception as e:
-            print(f"❌ Error during check: {e}")
-            print("Retrying in 60 seconds...")
-            time.sleep(60)
+            timings.update(status='failed', error=str(e))
+            raise
+        else:
+            timings.update(status='ok', **command.summary)
+        finally:
+            timings['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            print(json.dumps(timings), flush=True)
+    
+    def run_sweep():
+        """Retire donations that expired since the last sweep (once a day)"""
+        summary = sweep_expired_donations()
+        print(json.dumps({'sweep': summary, 'date': datetime.now().date().isoformat()}), flush=True)
+    
+    scheduler = ExpiryScheduler(run_check, sweep=run_sweep)
+    
+    # Wake up as soon as any donation is added or changed (LISTEN/NOTIFY on
+    # PostgreSQL, watermark polling on SQLite)
+    feed = start_listener(lambda event: scheduler.wake(), tables=[Donation._meta.db_table])
+    
+    def stop(signum, frame):
+        print(f"\n🛑 Received signal {signum}, stopping after the current check...")
+        feed.stop()
+        scheduler.stop()
+    
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    
+    # Sleep until the next donation crosses an alert milestone instead of
+    # polling every 2 minutes
+    print("🔄 Monitoring for expiring medicines (checks run when a donation crosses an alert milestone)...")
+    print("Press Ctrl+C to stop\n")
+    
+    scheduler.run_forever()
+    print("🛑 Monitoring stopped")
 
 if __name__ == "__main__":
     monitor_database_changes()
\ No newline at end of file
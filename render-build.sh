@@ -3,4 +3,5 @@ set -o errexit
  
 pip install -r requirements.txt
 python manage.py migrate --noinput
-python manage.py collectstatic --noinput
\ No newline at end of file
+python manage.py collectstatic --noinput
+python manage.py build_medicine_catalog
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+TABLE = 'healthbridge_app_medicinerequest'
+
+
+def install_trigger(apps, schema_editor):
+    """Publish request changes with NOTIFY through healthbridge_app's trigger function (PostgreSQL only)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_notify ON {TABLE}")
+    schema_editor.execute(
+        f"CREATE TRIGGER {TABLE}_notify "
+        f"AFTER INSERT OR UPDATE OR DELETE ON {TABLE} "
+        f"FOR EACH ROW EXECUTE FUNCTION healthbridge_notify_change()"
+    )
+
+
+def remove_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_notify ON {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0004_set_all_to_pending'),
+        ('healthbridge_app', '0010_change_feed_triggers'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_trigger, remove_trigger),
+    ]
@@ -88,6 +88,9 @@ class MedicineRequest(models.Model):
         help_text="Date when medicine will be ready for claiming (set by admin)"
     )
     
+    # Statuses before delivery; a request in one of these may still hold its matched donation
+    OPEN_STATUSES = (Status.PENDING, Status.MATCHED)
+    
     class Meta:
         ordering = ['-created_at']
         db_table = 'healthbridge_app_medicinerequest'